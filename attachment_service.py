@@ -0,0 +1,289 @@
+"""
+Attachment Service
+Streams inventory photos to disk and builds thumbnails in a process pool
+"""
+
+import os
+import hmac
+import uuid
+import asyncio
+import hashlib
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    from python_multipart.exceptions import MultipartParseError
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+    from multipart.exceptions import MultipartParseError
+
+# Attachment configuration
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
+ATTACHMENT_MAX_BYTES = int(os.environ.get("ATTACHMENT_MAX_BYTES", str(15 * 1024 * 1024)))
+ATTACHMENT_MAX_PER_QUOTE = int(os.environ.get("ATTACHMENT_MAX_PER_QUOTE", "20"))
+ATTACHMENT_WORKERS = int(os.environ.get("ATTACHMENT_WORKERS", "2"))
+THUMBNAIL_SIZE = (320, 320)
+CHUNK_SIZE = 64 * 1024
+
+# Key used to sign attachment links sent by email. Without it, links are
+# only valid until the process restarts.
+ATTACHMENT_SIGNING_KEY = os.environ.get("ATTACHMENT_SIGNING_KEY") or secrets.token_hex(32)
+
+# Accepted types, detected from the file's magic bytes (not the client's Content-Type)
+CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+}
+
+
+class AttachmentError(ValueError):
+    """Rejected upload; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def detect_content_type(head: bytes) -> Optional[str]:
+    """Identify an image type from its first bytes"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def quote_directory(tenant_id: str, quote_id: str) -> str:
+    return os.path.join(UPLOAD_DIR, tenant_id, quote_id)
+
+
+async def save_stream(chunks: AsyncIterator[bytes], directory: str,
+                      max_bytes: int = ATTACHMENT_MAX_BYTES) -> Tuple[str, int, str]:
+    """
+    Write an upload to a temporary file, chunk by chunk
+
+    Only one chunk is held in memory at a time. The size limit is enforced
+    while bytes arrive, so an oversized upload is cut off early.
+
+    Args:
+        chunks: Async iterator of body chunks
+        directory: Destination directory (created if missing)
+        max_bytes: Maximum accepted size
+
+    Returns:
+        (temporary path, size in bytes, detected content type)
+
+    Raises:
+        AttachmentError: 413 if too large, 415 if not an accepted image type
+    """
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".upload-{uuid.uuid4().hex}.part")
+    size = 0
+    content_type = None
+    head = b""
+
+    try:
+        with open(temp_path, "wb") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if content_type is None:
+                    head += chunk[:16]
+                    if len(head) >= 12:
+                        content_type = detect_content_type(head)
+                        if content_type is None:
+                            raise AttachmentError(
+                                f"Unsupported file type. Accepted: {', '.join(CONTENT_TYPES)}", 415
+                            )
+                size += len(chunk)
+                if size > max_bytes:
+                    raise AttachmentError(f"File too large. Maximum is {max_bytes / (1024 * 1024):.0f} MB", 413)
+                f.write(chunk)
+        if content_type is None:
+            raise AttachmentError("Empty or truncated file", 400)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return temp_path, size, content_type
+
+
+async def _multipart_events(chunks: AsyncIterator[bytes], boundary: bytes) -> AsyncIterator[Tuple[str, Any]]:
+    """Push body chunks through the parser and yield ("headers", dict), ("data", bytes), ("end", None)"""
+    events: List[Tuple[str, Any]] = []
+    headers: Dict[str, str] = {}
+    header_field, header_value = bytearray(), bytearray()
+    finished = False
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        headers[header_field.decode("latin-1").lower()] = header_value.decode("latin-1")
+        header_field.clear()
+        header_value.clear()
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        events.append(("data", bytes(data[start:end])))
+
+    def on_end() -> None:
+        nonlocal finished
+        finished = True
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": headers.clear,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": lambda: events.append(("headers", dict(headers))),
+        "on_part_data": on_part_data,
+        "on_part_end": lambda: events.append(("end", None)),
+        "on_end": on_end,
+    })
+
+    async for chunk in chunks:
+        try:
+            parser.write(chunk)
+        except MultipartParseError as e:
+            raise AttachmentError(f"Invalid multipart body: {str(e)}", 400)
+        for event in events:
+            yield event
+        events.clear()
+        if finished:
+            return
+    raise AttachmentError("Truncated multipart body", 400)
+
+
+async def iter_multipart_files(chunks: AsyncIterator[bytes], content_type: str,
+                               field: str = "files") -> AsyncIterator[Tuple[Optional[str], AsyncIterator[bytes]]]:
+    """
+    Stream the file parts of a multipart/form-data body
+
+    Nothing is spooled to disk: each file part is handed over as an async
+    iterator of chunks, which must be consumed before the next part is
+    yielded (save_stream does). Other fields are skipped.
+
+    Yields:
+        (client file name, chunk iterator) for each part named `field`
+
+    Raises:
+        AttachmentError: 400 if the body is not valid multipart
+    """
+    _, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise AttachmentError("Missing multipart boundary", 400)
+    events = _multipart_events(chunks, boundary)
+
+    async def part_data() -> AsyncIterator[bytes]:
+        async for kind, value in events:
+            if kind == "end":
+                return
+            yield value
+
+    async for kind, value in events:
+        if kind != "headers":
+            continue
+        _, disposition = parse_options_header(value.get("content-disposition", ""))
+        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        filename = disposition.get(b"filename")
+        if name == field and filename is not None:
+            yield filename.decode("utf-8", "replace"), part_data()
+        else:
+            async for _ in part_data():
+                pass
+
+
+def finalize_upload(temp_path: str, attachment_id: str, content_type: str) -> str:
+    """Move a completed upload to its final name and return the path"""
+    path = os.path.join(os.path.dirname(temp_path), f"{attachment_id}{CONTENT_TYPES[content_type]}")
+    os.replace(temp_path, path)
+    return path
+
+
+def thumbnail_path(path: str) -> str:
+    root, _ = os.path.splitext(path)
+    return f"{root}.thumb.jpg"
+
+
+def process_image(path: str, thumb_path: str) -> Dict[str, Any]:
+    """
+    Build a JPEG thumbnail and read basic metadata (runs in a worker process)
+
+    Returns:
+        width, height, format, takenAt (EXIF, if present) and thumbnail path
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return {"thumbnail": None}
+
+    with Image.open(path) as image:
+        metadata: Dict[str, Any] = {"format": image.format}
+        exif = image.getexif()
+        taken_at = exif.get(0x0132)  # DateTime
+        if taken_at:
+            metadata["takenAt"] = str(taken_at)
+
+        image = ImageOps.exif_transpose(image)
+        metadata["width"], metadata["height"] = image.size
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.convert("RGB").save(thumb_path, "JPEG", quality=80, optimize=True)
+
+    metadata["thumbnail"] = thumb_path
+    return metadata
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Get the image processing pool, created on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=ATTACHMENT_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def extract_metadata(path: str) -> Dict[str, Any]:
+    """Run process_image off the event loop, in the process pool"""
+    global _pool
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    try:
+        return await loop.run_in_executor(pool, process_image, path, thumbnail_path(path))
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge image): replace the pool, unless a
+        # concurrent upload already did, and retry once
+        if _pool is pool:
+            _pool = None
+            pool.shutdown(wait=False)
+        return await loop.run_in_executor(get_pool(), process_image, path, thumbnail_path(path))
+
+
+def sign_attachment(tenant_id: str, attachment_id: str) -> str:
+    """Token authorising access to one attachment (used in email links)"""
+    message = f"{tenant_id}:{attachment_id}".encode()
+    return hmac.new(ATTACHMENT_SIGNING_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def verify_attachment_token(tenant_id: str, attachment_id: str, token: Optional[str]) -> bool:
+    # Compared as bytes: compare_digest rejects non-ASCII str with TypeError
+    return bool(token) and hmac.compare_digest(token.encode(), sign_attachment(tenant_id, attachment_id).encode())
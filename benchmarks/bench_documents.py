@@ -0,0 +1,60 @@
+"""
+Document Benchmark
+Measures PDF render time, cached lookups and a batch pre-render
+
+Usage: python benchmarks/bench_documents.py [batch_size]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_service import DocumentCache, DocumentService, document_data, render_quote_pdf
+
+
+def build_quote(i: int) -> dict:
+    return {
+        "serviceId": "priv",
+        "date": "2026-02-15T10:00:00Z",
+        "contact": {"name": f"Client {i}", "email": f"client{i}@example.com", "phone": "+41791234567"},
+        "fromZip": "1201",
+        "toZip": "1003",
+        "volume": 40 + i % 30,
+        "rooms": 3.5,
+        "housingType": "appartement",
+        "floor": i % 6,
+        "status": "confirmed",
+        "createdAt": "2026-02-01T09:00:00",
+    }
+
+
+async def run(batch_size: int) -> None:
+    directory = tempfile.mkdtemp(prefix="bm-docs-")
+    service = DocumentService(DocumentCache(directory))
+    batch = [document_data("batimove", f"quote-{i}", build_quote(i)) for i in range(batch_size)]
+
+    start = time.perf_counter()
+    for _ in range(20):
+        render_quote_pdf(batch[0], os.path.join(directory, "inline.part"))
+    print(f"Render (in process): {1000 * (time.perf_counter() - start) / 20:.1f} ms per document")
+
+    start = time.perf_counter()
+    result = await service.prerender(batch)
+    elapsed = time.perf_counter() - start
+    print(f"Pre-render of {batch_size} documents ({service.workers} workers): {elapsed:.2f}s {result}")
+
+    start = time.perf_counter()
+    for data in batch:
+        await service.get_document(data)
+    elapsed = time.perf_counter() - start
+    print(f"Cached lookup (hash + stat): {1e6 * elapsed / batch_size:.0f} µs per document")
+
+    service.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,75 @@
+"""
+Export Benchmark
+Measures throughput and peak memory of the chunked CSV/Parquet export
+
+Usage: python benchmarks/bench_export.py [record_count]
+"""
+
+import os
+import sys
+import time
+import uuid
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export_service import export_collection, PARQUET_ENABLED
+
+
+def build_quotes(count: int) -> dict:
+    """Build a quotes collection shaped like MockDB.quotes"""
+    start = datetime(2026, 1, 1)
+    quotes = {}
+    for i in range(count):
+        quotes[str(uuid.uuid4())] = {
+            "serviceId": "priv",
+            "date": "2026-02-15T10:00:00Z",
+            "contact": {"name": f"Client {i}", "email": f"client{i}@example.com", "phone": "+41791234567"},
+            "fromZip": "1201",
+            "toZip": "1003",
+            "volume": 40 + i % 30,
+            "rooms": 3.5,
+            "housingType": "appartement",
+            "surface": None,
+            "duration": None,
+            "floor": i % 6,
+            "createdAt": (start + timedelta(seconds=i)).isoformat(),
+        }
+    return quotes
+
+
+def run(label: str, count: int, produce) -> None:
+    # Timed pass without tracemalloc (it slows allocation-heavy code a lot)
+    begin = time.perf_counter()
+    size = produce()
+    elapsed = time.perf_counter() - begin
+
+    tracemalloc.start()
+    produce()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<26} {count / elapsed:9,.0f} rows/s  {size / elapsed / 1e6:6.1f} MB/s  "
+          f"output {size / 1e6:6.1f} MB  peak {peak / 1e6:7.1f} MB")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    quotes = build_quotes(count)
+    print(f"{count} quotes")
+
+    def full_list_csv():
+        # Baseline: materialise every row, then encode in one piece
+        return len(b"".join(list(export_collection(quotes, "quotes", "csv", chunk_size=count))))
+
+    def streamed(fmt):
+        return lambda: sum(len(block) for block in export_collection(quotes, "quotes", fmt))
+
+    run("csv, single chunk", count, full_list_csv)
+    run("csv, 5000-row chunks", count, streamed("csv"))
+    if PARQUET_ENABLED:
+        run("parquet, 5000-row chunks", count, streamed("parquet"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Snapshot Benchmark
+Measures snapshot write and restore time for a large store
+
+Usage: python benchmarks/bench_snapshot.py [record_count] [snapshot_path]
+"""
+
+import os
+import sys
+import time
+import uuid
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store_persistence import write_snapshot, read_snapshot, apply_retention
+
+
+def build_quotes(count: int) -> dict:
+    """Build a quotes collection shaped like MockDB.quotes"""
+    start = datetime(2026, 1, 1)
+    return {
+        str(uuid.uuid4()): {
+            "serviceId": "priv",
+            "date": "2026-02-15T10:00:00Z",
+            "contact": {"name": f"Client {i}", "email": f"client{i}@example.com", "phone": "+41791234567"},
+            "fromZip": "1201",
+            "toZip": "1003",
+            "volume": 40 + i % 30,
+            "rooms": 3.5,
+            "housingType": "appartement",
+            "surface": None,
+            "duration": None,
+            "floor": i % 6,
+            "createdAt": (start + timedelta(seconds=i * 10)).isoformat(),
+        }
+        for i in range(count)
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), "bench_snapshot.bin")
+    quotes = build_quotes(count)
+
+    begin = time.perf_counter()
+    write_snapshot(path, {"quotes": quotes})
+    written = time.perf_counter() - begin
+    size = os.path.getsize(path)
+
+    begin = time.perf_counter()
+    restored = read_snapshot(path)
+    restore = time.perf_counter() - begin
+    assert len(restored["quotes"]) == count
+
+    begin = time.perf_counter()
+    evicted = apply_retention(restored["quotes"], max_records=count // 2)
+    retention = time.perf_counter() - begin
+
+    print(f"{count} records  file {size / 1e6:.1f} MB")
+    print(f"write    {written:.2f} s")
+    print(f"restore  {restore:.2f} s")
+    print(f"evict {evicted} oldest  {retention:.2f} s")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Spam Filter Benchmark
+Measures accuracy and per-check cost of the spam filter on a labeled corpus
+
+Usage: python benchmarks/bench_spam_filter.py [corpus.jsonl]
+"""
+
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spam_filter import SpamFilter
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spam_corpus.jsonl")
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS
+    with open(path, "r", encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+
+    spam_filter = SpamFilter.from_env()
+
+    counts = {"tp": 0, "fp": 0, "tn": 0, "fn": 0}
+    for sample in samples:
+        flagged = spam_filter.check(sample["email"], sample["text"]).is_spam
+        spam = sample["label"] == "spam"
+        counts[("t" if flagged == spam else "f") + ("p" if flagged else "n")] += 1
+        if flagged != spam:
+            print(f"  misclassified ({sample['label']}): {sample['text'][:70]}")
+
+    rounds = 2000
+    begin = time.perf_counter()
+    for _ in range(rounds):
+        for sample in samples:
+            spam_filter.check(sample["email"], sample["text"])
+    per_check = (time.perf_counter() - begin) / (rounds * len(samples))
+
+    precision = counts["tp"] / max(1, counts["tp"] + counts["fp"])
+    recall = counts["tp"] / max(1, counts["tp"] + counts["fn"])
+    print(f"{len(samples)} samples  {counts}")
+    print(f"precision {precision:.2f}  recall {recall:.2f}  {per_check * 1e6:.1f} µs/check")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Multi-Tenant Benchmark
+Latency of quiet tenants, alone and while one tenant floods the API
+
+Usage: python benchmarks/bench_tenants.py [tenant_count]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TENANT_COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+NOISY_RECORDS = 200_000
+
+config_path = os.path.join(tempfile.gettempdir(), "bench_tenants.json")
+with open(config_path, "w") as f:
+    json.dump({
+        "default": None,
+        "tenants": [
+            {"id": f"t{i}", "hosts": [f"t{i}.example.ch"], "rate_limit": {"per_minute": 600, "burst": 50}}
+            for i in range(TENANT_COUNT)
+        ],
+    }, f)
+
+os.environ.update(TENANTS_CONFIG=config_path, EMAIL_TRANSPORT="memory", SNAPSHOT_PATH="")
+
+import httpx
+import main
+
+MESSAGE = {
+    "name": "Marie Martin",
+    "email": "marie.martin@example.com",
+    "subject": "Devis",
+    "message": "Bonjour, nous déménageons un appartement de 3 pièces à Genève.",
+}
+
+
+async def post(client: httpx.AsyncClient, tenant: str, latencies: list) -> int:
+    begin = time.perf_counter()
+    response = await client.post("/api/contact", json=MESSAGE, headers={"X-Tenant-ID": tenant})
+    latencies.append(time.perf_counter() - begin)
+    return response.status_code
+
+
+async def quiet_round(client: httpx.AsyncClient) -> list:
+    latencies: list = []
+    for i in range(1, TENANT_COUNT):
+        await post(client, f"t{i}", latencies)
+        # In-process requests never block on I/O: yield so flooders get their turn
+        await asyncio.sleep(0)
+    return latencies
+
+
+async def flood(client: httpx.AsyncClient, stop: asyncio.Event, codes: dict) -> None:
+    while not stop.is_set():
+        code = await post(client, "t0", [])
+        codes[code] = codes.get(code, 0) + 1
+        await asyncio.sleep(0)
+
+
+def summary(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95)]
+    return f"p50 {1000 * statistics.median(latencies):.2f} ms  p95 {1000 * p95:.2f} ms"
+
+
+async def run():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Resolution cost on the hot path
+        begin = time.perf_counter()
+        for i in range(100_000):
+            main.tenants.resolve(host=f"t{i % TENANT_COUNT}.example.ch")
+        print(f"{TENANT_COUNT} tenants  resolve {(time.perf_counter() - begin) * 10:.2f} µs")
+
+        # Large dataset on the noisy tenant
+        noisy = await main.get_partition(main.tenants.tenants["t0"])
+        for i in range(NOISY_RECORDS):
+            noisy.db.add_message({**MESSAGE, "message": f"{MESSAGE['message']} {i}"})
+
+        await quiet_round(client)  # warm-up: creates every partition
+        print(f"quiet tenants alone       {summary(await quiet_round(client))}")
+
+        stop, codes = asyncio.Event(), {}
+        flooders = [asyncio.create_task(flood(client, stop, codes)) for _ in range(8)]
+        latencies = await quiet_round(client)
+        stop.set()
+        await asyncio.gather(*flooders)
+        print(f"quiet tenants + flood     {summary(latencies)}")
+        print(f"flooding tenant responses {codes}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
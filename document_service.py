@@ -0,0 +1,401 @@
+"""
+Document Service
+Renders branded PDF quote documents in a process pool, with an LRU disk cache
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from email_service import DEFAULT_EMAIL_SETTINGS, SERVICE_NAMES, EmailSettings
+
+try:
+    from reportlab.lib.colors import HexColor, white
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen.canvas import Canvas
+    PDF_ENABLED = True
+except ImportError:
+    PDF_ENABLED = False
+
+# Document configuration
+DOCUMENT_CACHE_DIR = os.environ.get("DOCUMENT_CACHE_DIR", "cache/documents")
+DOCUMENT_CACHE_MAX_BYTES = int(os.environ.get("DOCUMENT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+DOCUMENT_CACHE_MAX_FILES = int(os.environ.get("DOCUMENT_CACHE_MAX_FILES", "5000"))
+DOCUMENT_WORKERS = int(os.environ.get("DOCUMENT_WORKERS", "2"))
+
+# Bump when the layout changes so cached documents are rendered again
+TEMPLATE_VERSION = 1
+
+# Quote fields shown in the "Détails du Service" section: (field, label, unit)
+DETAIL_FIELDS = [
+    ("fromZip", "NPA Départ", ""),
+    ("toZip", "NPA Arrivée", ""),
+    ("volume", "Volume", " m³"),
+    ("rooms", "Nombre de pièces", ""),
+    ("surface", "Surface", " m²"),
+    ("housingType", "Type de bien", ""),
+    ("duration", "Durée", ""),
+    ("floor", "Étage", ""),
+]
+
+# Everything render_quote_pdf draws; other fields (status, ...) do not affect the document
+QUOTE_FIELDS = ("serviceId", "date", "createdAt", *(name for name, _, _ in DETAIL_FIELDS))
+CONTACT_FIELDS = ("name", "email", "phone")
+SETTINGS_FIELDS = ("company_name", "address", "company_email", "primary_color", "accent_color")
+
+
+def document_data(tenant_id: str, quote_id: str, quote: Dict[str, Any],
+                  settings: Optional[EmailSettings] = None) -> Dict[str, Any]:
+    """
+    Collect exactly what a quote document shows
+
+    The result is both the renderer's input and the source of the cache
+    key: a change to a drawn field or to the tenant branding yields a new
+    document, other changes (such as the status) reuse the cached one.
+    """
+    settings = settings or DEFAULT_EMAIL_SETTINGS
+    contact = quote.get("contact") or {}
+    return {
+        "version": TEMPLATE_VERSION,
+        "tenantId": tenant_id,
+        "quoteId": quote_id,
+        "quote": {
+            **{k: quote[k] for k in QUOTE_FIELDS if k in quote},
+            "contact": {k: contact[k] for k in CONTACT_FIELDS if k in contact},
+        },
+        "photos": len(quote.get("attachmentIds", [])),
+        "settings": {k: getattr(settings, k) for k in SETTINGS_FIELDS},
+    }
+
+
+def document_key(data: Dict[str, Any]) -> str:
+    """SHA-256 of the canonical JSON form of the document data"""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def format_date(value: Any) -> str:
+    """Show ISO dates as DD.MM.YYYY, leave anything else as is"""
+    if not value:
+        return "N/A"
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).strftime("%d.%m.%Y")
+    except ValueError:
+        return str(value)
+
+
+def render_quote_pdf(data: Dict[str, Any], path: str) -> int:
+    """
+    Draw the quote document to `path` (runs in a worker process)
+
+    Uses the tenant's email branding: primary color header, accent rule,
+    info boxes with a colored left border and a company footer.
+
+    Returns:
+        Size of the written file in bytes
+    """
+    settings = data["settings"]
+    quote = data["quote"]
+    contact = quote.get("contact") or {}
+    primary = HexColor(settings["primary_color"])
+    accent = HexColor(settings["accent_color"])
+    width, height = A4
+    margin = 50
+
+    # invariant: no timestamp in the file, so equal inputs give equal bytes
+    pdf = Canvas(path, pagesize=A4, invariant=1)
+    pdf.setTitle(f"Devis {data['quoteId']}")
+    pdf.setAuthor(settings["company_name"])
+
+    # Header
+    pdf.setFillColor(primary)
+    pdf.rect(0, height - 120, width, 120, stroke=0, fill=1)
+    pdf.setFillColor(accent)
+    pdf.rect(0, height - 126, width, 6, stroke=0, fill=1)
+    pdf.setFillColor(white)
+    pdf.setFont("Helvetica-Bold", 24)
+    pdf.drawString(margin, height - 60, settings["company_name"])
+    pdf.setFont("Helvetica", 11)
+    pdf.drawString(margin, height - 82, settings["address"])
+    pdf.setFont("Helvetica-Bold", 18)
+    pdf.drawRightString(width - margin, height - 60, "DEVIS")
+    pdf.setFont("Helvetica", 10)
+    pdf.drawRightString(width - margin, height - 82, f"Réf. {data['quoteId'][:8].upper()}")
+    pdf.drawRightString(width - margin, height - 96, f"Demande du {format_date(quote.get('createdAt'))}")
+
+    def info_box(top: float, title: str, rows: List[Tuple[str, str]]) -> float:
+        box_height = 40 + 18 * len(rows)
+        pdf.setFillColor(HexColor("#f8f9fa"))
+        pdf.rect(margin, top - box_height, width - 2 * margin, box_height, stroke=0, fill=1)
+        pdf.setFillColor(primary)
+        pdf.rect(margin, top - box_height, 4, box_height, stroke=0, fill=1)
+        pdf.setFont("Helvetica-Bold", 13)
+        pdf.drawString(margin + 18, top - 24, title)
+        y = top - 46
+        for label, value in rows:
+            pdf.setFillColor(HexColor("#666666"))
+            pdf.setFont("Helvetica-Bold", 10)
+            pdf.drawString(margin + 18, y, f"{label}:")
+            pdf.setFillColor(HexColor("#333333"))
+            pdf.setFont("Helvetica", 10)
+            pdf.drawString(margin + 160, y, value)
+            y -= 18
+        return top - box_height - 20
+
+    top = info_box(height - 160, "Informations Client", [
+        ("Nom", contact.get("name", "N/A")),
+        ("Email", contact.get("email", "N/A")),
+        ("Téléphone", contact.get("phone", "N/A")),
+    ])
+
+    service_id = quote.get("serviceId", "N/A")
+    details = [
+        ("Service", SERVICE_NAMES.get(service_id, service_id)),
+        ("Date souhaitée", format_date(quote.get("date"))),
+    ]
+    for field_name, label, unit in DETAIL_FIELDS:
+        value = quote.get(field_name)
+        if value not in (None, ""):
+            text = str(value).capitalize() if field_name == "housingType" else f"{value}{unit}"
+            details.append((label, text))
+    if data["photos"]:
+        details.append(("Photos d'inventaire", str(data["photos"])))
+    top = info_box(top, "Détails du Service", details)
+
+    # Footer
+    pdf.setStrokeColor(HexColor("#dddddd"))
+    pdf.line(margin, 70, width - margin, 70)
+    pdf.setFillColor(HexColor("#666666"))
+    pdf.setFont("Helvetica", 9)
+    pdf.drawCentredString(width / 2, 54, f"{settings['company_name']} - {settings['address']}")
+    pdf.drawCentredString(width / 2, 40, settings["company_email"])
+
+    pdf.showPage()
+    pdf.save()
+    return os.path.getsize(path)
+
+
+class DocumentCache:
+    """
+    Rendered documents on disk, evicted least recently used first
+
+    Files are named by their document key. Recency is tracked in memory and
+    mirrored in the file modification time, so the order survives restarts.
+    Only used from the event loop thread.
+    """
+
+    def __init__(self, directory: str = DOCUMENT_CACHE_DIR, max_bytes: int = DOCUMENT_CACHE_MAX_BYTES,
+                 max_files: int = DOCUMENT_CACHE_MAX_FILES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.total_bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size
+        self._load()
+
+    def _load(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+            elif entry.name.endswith(".part"):
+                os.remove(entry.path)  # left over by an interrupted render
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def temp_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.part")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a cached document (marked as recently used), or None"""
+        if key not in self._entries:
+            return None
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.total_bytes -= self._entries.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return path
+
+    def add(self, key: str, temp_path: str, size: int) -> str:
+        """Move a freshly rendered file into the cache and evict old entries"""
+        path = self.path(key)
+        os.replace(temp_path, path)
+        self.total_bytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        # Never evict the newest entry: it is about to be served
+        while len(self._entries) > 1 and (
+            self.total_bytes > self.max_bytes or len(self._entries) > self.max_files
+        ):
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DocumentService:
+    """
+    Quote documents, rendered once per content version
+
+    Rendering runs in a process pool so request handling never waits on
+    PDF layout. Concurrent requests for the same document share one render.
+    """
+
+    def __init__(self, cache: Optional[DocumentCache] = None, workers: int = DOCUMENT_WORKERS):
+        self.workers = workers
+        self._cache = cache
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats: Dict[str, int] = {"hits": 0, "renders": 0, "failures": 0}
+
+    @property
+    def cache(self) -> DocumentCache:
+        if self._cache is None:
+            self._cache = DocumentCache()
+        return self._cache
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _run_in_pool(self, func, *args):
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        try:
+            return await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM): replace the pool, unless a concurrent
+            # render already did, and retry once
+            if self._pool is pool:
+                self._pool = None
+                pool.shutdown(wait=False)
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+
+    async def get_document(self, data: Dict[str, Any], key: Optional[str] = None) -> str:
+        """
+        Path of the PDF for `data` (see document_data), rendering it if needed
+
+        Raises:
+            RuntimeError: If reportlab is not installed
+        """
+        if not PDF_ENABLED:
+            raise RuntimeError("PDF documents require reportlab")
+        key = key or document_key(data)
+        path = self.cache.get(key)
+        if path is not None:
+            self.stats["hits"] += 1
+            return path
+
+        # The render task belongs to no request: a caller that disconnects
+        # stops waiting without cancelling the render for the others
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._render(key, data))
+            task.add_done_callback(lambda t: self._render_done(key, t))
+        return await asyncio.shield(task)
+
+    def _render_done(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["failures"] += 1
+
+    async def _render(self, key: str, data: Dict[str, Any]) -> str:
+        temp_path = self.cache.temp_path(key)
+        try:
+            size = await self._run_in_pool(render_quote_pdf, data, temp_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        # If cancelled (pool shutdown), the worker may still be writing the
+        # temp file: it is left for DocumentCache to remove on next start
+        self.stats["renders"] += 1
+        return self.cache.add(key, temp_path, size)
+
+    async def prerender(self, documents: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Make sure every document is in the cache (e.g. tomorrow's confirmed jobs)
+
+        Renders are submitted together; the pool size bounds how many run at once.
+
+        Returns:
+            Counts of documents requested, already cached, rendered and failed
+
+        Raises:
+            RuntimeError: If reportlab is not installed
+        """
+        if not PDF_ENABLED:
+            raise RuntimeError("PDF documents require reportlab")
+        pending = []
+        result = {"requested": 0, "cached": 0, "rendered": 0, "failed": 0}
+        seen = set()
+        for data in documents:
+            key = document_key(data)
+            if key in seen:
+                continue
+            seen.add(key)
+            result["requested"] += 1
+            if key in self.cache:
+                result["cached"] += 1
+            else:
+                pending.append(self.get_document(data, key))
+        for outcome in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(outcome, BaseException):
+                print(f"Document pre-render failed: {str(outcome)}")
+                result["failed"] += 1
+            else:
+                result["rendered"] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "cached": len(self.cache),
+            "cache_bytes": self.cache.total_bytes,
+            "evictions": self.cache.evictions,
+        }
+
+
+# Global document service instance
+_service = DocumentService()
+
+
+def get_document_service() -> DocumentService:
+    """Get the document service instance"""
+    return _service
@@ -1,47 +1,71 @@
 """
-Email Service using Resend
-Handles all email sending for Batimove
+Email Service
+Handles all email sending for Batimove (transport selected by EMAIL_TRANSPORT)
 """
 
-import os
-import resend
-from typing import Dict, Any
+import html
+from dataclasses import dataclass, fields
+from typing import Dict, Any, List, Optional
 
-# Initialize Resend with API key from environment
-resend.api_key = os.environ.get("RESEND_API_KEY", "")
+from email_transport import get_transport
 
 # Email configuration
 COMPANY_EMAIL = "info@batimove.ch"
 FROM_EMAIL = "Batimove Website <noreply@onboarding.resend.dev>"  # Temporary - change to noreply@batimove.ch when domain is configured
 
 
-def send_quote_email(quote_data: Dict[str, Any]) -> Dict[str, Any]:
+@dataclass
+class EmailSettings:
+    """Per-tenant sender, recipient, branding and subject templates"""
+    company_email: str = COMPANY_EMAIL
+    from_email: str = FROM_EMAIL
+    company_name: str = "Batimove Sarl"
+    address: str = "Rue de Monthoux 64, 1201 Genève"
+    primary_color: str = "#0052A3"
+    primary_dark_color: str = "#003d7a"
+    accent_color: str = "#E10600"
+    quote_subject: str = "🚚 Nouveau Devis: {service_name} - {name}"
+    contact_subject: str = "💬 Contact: {subject} - {name}"
+    attachments_subject: str = "📷 Photos: {count} fichier(s) - {name}"
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "EmailSettings":
+        """Build settings from a tenant config, ignoring unknown keys"""
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (data or {}).items() if k in known})
+
+
+DEFAULT_EMAIL_SETTINGS = EmailSettings()
+
+# Map service IDs to French names
+SERVICE_NAMES = {
+    'priv': 'Déménagement Privé',
+    'pro': 'Transfert Pro',
+    'clean': 'Nettoyage',
+    'storage': 'Garde-Meubles',
+    'lift': 'Monte-Meubles',
+    'inter': 'International',
+    'general': 'Sur Mesure'
+}
+
+
+def send_quote_email(quote_data: Dict[str, Any], settings: EmailSettings = DEFAULT_EMAIL_SETTINGS) -> Dict[str, Any]:
     """
     Send quote request email to company
     
     Args:
         quote_data: Dictionary containing quote information
+        settings: Tenant email settings
         
     Returns:
-        Resend API response
+        Transport response
     """
     
     # Extract contact info
     contact = quote_data.get('contact', {})
     service_id = quote_data.get('serviceId', 'N/A')
     
-    # Map service IDs to French names
-    service_names = {
-        'priv': 'Déménagement Privé',
-        'pro': 'Transfert Pro',
-        'clean': 'Nettoyage',
-        'storage': 'Garde-Meubles',
-        'lift': 'Monte-Meubles',
-        'inter': 'International',
-        'general': 'Sur Mesure'
-    }
-    
-    service_name = service_names.get(service_id, service_id)
+    service_name = SERVICE_NAMES.get(service_id, service_id)
     
     # Build HTML email
     html_content = f"""
@@ -52,15 +76,15 @@ def send_quote_email(quote_data: Dict[str, Any]) -> Dict[str, Any]:
         <style>
             body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }}
             .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #0052A3 0%, #003d7a 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .header {{ background: linear-gradient(135deg, {settings.primary_color} 0%, {settings.primary_dark_color} 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
             .header h1 {{ margin: 0; font-size: 24px; }}
             .content {{ background: #f8f9fa; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .info-box {{ background: white; padding: 20px; margin: 15px 0; border-radius: 8px; border-left: 4px solid #0052A3; }}
+            .info-box {{ background: white; padding: 20px; margin: 15px 0; border-radius: 8px; border-left: 4px solid {settings.primary_color}; }}
             .info-row {{ margin: 10px 0; }}
-            .label {{ font-weight: bold; color: #0052A3; display: inline-block; width: 150px; }}
+            .label {{ font-weight: bold; color: {settings.primary_color}; display: inline-block; width: 150px; }}
             .value {{ color: #333; }}
             .footer {{ text-align: center; margin-top: 20px; padding: 20px; color: #666; font-size: 12px; }}
-            .badge {{ background: #E10600; color: white; padding: 5px 15px; border-radius: 20px; font-size: 12px; font-weight: bold; display: inline-block; margin-top: 10px; }}
+            .badge {{ background: {settings.accent_color}; color: white; padding: 5px 15px; border-radius: 20px; font-size: 12px; font-weight: bold; display: inline-block; margin-top: 10px; }}
         </style>
     </head>
     <body>
@@ -72,7 +96,7 @@ def send_quote_email(quote_data: Dict[str, Any]) -> Dict[str, Any]:
             
             <div class="content">
                 <div class="info-box">
-                    <h3 style="margin-top: 0; color: #0052A3;">📋 Informations Client</h3>
+                    <h3 style="margin-top: 0; color: {settings.primary_color};">📋 Informations Client</h3>
                     <div class="info-row">
                         <span class="label">Nom:</span>
                         <span class="value">{contact.get('name', 'N/A')}</span>
@@ -88,7 +112,7 @@ def send_quote_email(quote_data: Dict[str, Any]) -> Dict[str, Any]:
                 </div>
                 
                 <div class="info-box">
-                    <h3 style="margin-top: 0; color: #0052A3;">📦 Détails du Service</h3>
+                    <h3 style="margin-top: 0; color: {settings.primary_color};">📦 Détails du Service</h3>
                     <div class="info-row">
                         <span class="label">Service:</span>
                         <span class="value">{service_name}</span>
@@ -144,18 +168,18 @@ def send_quote_email(quote_data: Dict[str, Any]) -> Dict[str, Any]:
                     </div>
         """
     
-    html_content += """
+    html_content += f"""
                 </div>
                 
                 <div style="background: #e3f2fd; padding: 15px; border-radius: 8px; margin-top: 20px;">
-                    <p style="margin: 0; font-size: 14px; color: #0052A3;">
+                    <p style="margin: 0; font-size: 14px; color: {settings.primary_color};">
                         <strong>⏰ Action requise:</strong> Contactez ce client sous 24h pour établir un devis personnalisé.
                     </p>
                 </div>
             </div>
             
             <div class="footer">
-                <p>Batimove Sarl | Rue de Monthoux 64, 1201 Genève</p>
+                <p>{settings.company_name} | {settings.address}</p>
                 <p>Ce message a été généré automatiquement depuis le site web.</p>
             </div>
         </div>
@@ -166,13 +190,13 @@ def send_quote_email(quote_data: Dict[str, Any]) -> Dict[str, Any]:
     # Send email
     try:
         params = {
-            "from": FROM_EMAIL,
-            "to": [COMPANY_EMAIL],
-            "subject": f"🚚 Nouveau Devis: {service_name} - {contact.get('name', 'Client')}",
+            "from": settings.from_email,
+            "to": [settings.company_email],
+            "subject": settings.quote_subject.format(service_name=service_name, name=contact.get('name', 'Client')),
             "html": html_content
         }
         
-        response = resend.Emails.send(params)
+        response = get_transport().send(params)
         return {"success": True, "id": response.get("id")}
     
     except Exception as e:
@@ -180,15 +204,16 @@ def send_quote_email(quote_data: Dict[str, Any]) -> Dict[str, Any]:
         raise
 
 
-def send_contact_email(contact_data: Dict[str, Any]) -> Dict[str, Any]:
+def send_contact_email(contact_data: Dict[str, Any], settings: EmailSettings = DEFAULT_EMAIL_SETTINGS) -> Dict[str, Any]:
     """
     Send contact form message to company
     
     Args:
         contact_data: Dictionary containing contact form data
+        settings: Tenant email settings
         
     Returns:
-        Resend API response
+        Transport response
     """
     
     name = contact_data.get('name', 'N/A')
@@ -205,16 +230,16 @@ def send_contact_email(contact_data: Dict[str, Any]) -> Dict[str, Any]:
         <style>
             body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }}
             .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background: linear-gradient(135deg, #0052A3 0%, #003d7a 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .header {{ background: linear-gradient(135deg, {settings.primary_color} 0%, {settings.primary_dark_color} 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
             .header h1 {{ margin: 0; font-size: 24px; }}
             .content {{ background: #f8f9fa; padding: 30px; border-radius: 0 0 10px 10px; }}
-            .info-box {{ background: white; padding: 20px; margin: 15px 0; border-radius: 8px; border-left: 4px solid #0052A3; }}
+            .info-box {{ background: white; padding: 20px; margin: 15px 0; border-radius: 8px; border-left: 4px solid {settings.primary_color}; }}
             .info-row {{ margin: 10px 0; }}
-            .label {{ font-weight: bold; color: #0052A3; display: inline-block; width: 100px; }}
+            .label {{ font-weight: bold; color: {settings.primary_color}; display: inline-block; width: 100px; }}
             .value {{ color: #333; }}
             .message-box {{ background: white; padding: 20px; margin: 15px 0; border-radius: 8px; border: 2px solid #e3f2fd; }}
             .footer {{ text-align: center; margin-top: 20px; padding: 20px; color: #666; font-size: 12px; }}
-            .badge {{ background: #E10600; color: white; padding: 5px 15px; border-radius: 20px; font-size: 12px; font-weight: bold; display: inline-block; margin-top: 10px; }}
+            .badge {{ background: {settings.accent_color}; color: white; padding: 5px 15px; border-radius: 20px; font-size: 12px; font-weight: bold; display: inline-block; margin-top: 10px; }}
         </style>
     </head>
     <body>
@@ -226,7 +251,7 @@ def send_contact_email(contact_data: Dict[str, Any]) -> Dict[str, Any]:
             
             <div class="content">
                 <div class="info-box">
-                    <h3 style="margin-top: 0; color: #0052A3;">👤 Informations de Contact</h3>
+                    <h3 style="margin-top: 0; color: {settings.primary_color};">👤 Informations de Contact</h3>
                     <div class="info-row">
                         <span class="label">Nom:</span>
                         <span class="value">{name}</span>
@@ -242,19 +267,19 @@ def send_contact_email(contact_data: Dict[str, Any]) -> Dict[str, Any]:
                 </div>
                 
                 <div class="message-box">
-                    <h3 style="margin-top: 0; color: #0052A3;">📝 Message</h3>
+                    <h3 style="margin-top: 0; color: {settings.primary_color};">📝 Message</h3>
                     <p style="white-space: pre-wrap; margin: 0;">{message}</p>
                 </div>
                 
                 <div style="background: #e3f2fd; padding: 15px; border-radius: 8px; margin-top: 20px;">
-                    <p style="margin: 0; font-size: 14px; color: #0052A3;">
+                    <p style="margin: 0; font-size: 14px; color: {settings.primary_color};">
                         <strong>⏰ Action requise:</strong> Répondez à ce message sous 24h.
                     </p>
                 </div>
             </div>
             
             <div class="footer">
-                <p>Batimove Sarl | Rue de Monthoux 64, 1201 Genève</p>
+                <p>{settings.company_name} | {settings.address}</p>
                 <p>Ce message a été généré automatiquement depuis le formulaire de contact.</p>
             </div>
         </div>
@@ -265,16 +290,125 @@ def send_contact_email(contact_data: Dict[str, Any]) -> Dict[str, Any]:
     # Send email
     try:
         params = {
-            "from": FROM_EMAIL,
-            "to": [COMPANY_EMAIL],
-            "subject": f"💬 Contact: {subject} - {name}",
+            "from": settings.from_email,
+            "to": [settings.company_email],
+            "subject": settings.contact_subject.format(subject=subject, name=name),
             "html": html_content,
             "reply_to": email  # Allow direct reply to customer
         }
         
-        response = resend.Emails.send(params)
+        response = get_transport().send(params)
         return {"success": True, "id": response.get("id")}
     
     except Exception as e:
         print(f"Error sending contact email: {str(e)}")
         raise
+
+
+def send_attachments_email(quote_data: Dict[str, Any], attachments: List[Dict[str, Any]],
+                           settings: EmailSettings = DEFAULT_EMAIL_SETTINGS) -> Dict[str, Any]:
+    """
+    Notify the company that photos were added to a quote
+    
+    Photos are linked, never embedded, so the email stays small.
+    
+    Args:
+        quote_data: Dictionary containing quote information
+        attachments: List of dicts with filename, size and optional url and thumbnailUrl
+        settings: Tenant email settings
+        
+    Returns:
+        Transport response
+    """
+    
+    contact = quote_data.get('contact', {})
+    name = contact.get('name', 'Client')
+    
+    # File names come from anonymous uploads: escape everything user-supplied
+    rows = ""
+    for attachment in attachments:
+        filename = html.escape(attachment.get('filename') or 'photo')
+        preview = ""
+        if attachment.get('url'):
+            url = html.escape(attachment['url'])
+            if attachment.get('thumbnailUrl'):
+                preview = f'<a href="{url}"><img src="{html.escape(attachment["thumbnailUrl"])}" alt="" style="max-width: 160px; border-radius: 6px; display: block; margin-bottom: 5px;"></a>'
+            filename = f'<a href="{url}">{filename}</a>'
+        rows += f"""
+                    <div class="info-row">
+                        {preview}
+                        {filename}
+                        <span style="color: #666;">({attachment.get('size', 0) / 1024 / 1024:.1f} MB)</span>
+                    </div>
+        """
+    
+    # Build HTML email
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <style>
+            body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, {settings.primary_color} 0%, {settings.primary_dark_color} 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .header h1 {{ margin: 0; font-size: 24px; }}
+            .content {{ background: #f8f9fa; padding: 30px; border-radius: 0 0 10px 10px; }}
+            .info-box {{ background: white; padding: 20px; margin: 15px 0; border-radius: 8px; border-left: 4px solid {settings.primary_color}; }}
+            .info-row {{ margin: 10px 0; }}
+            .footer {{ text-align: center; margin-top: 20px; padding: 20px; color: #666; font-size: 12px; }}
+            .badge {{ background: {settings.accent_color}; color: white; padding: 5px 15px; border-radius: 20px; font-size: 12px; font-weight: bold; display: inline-block; margin-top: 10px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>📷 Photos Ajoutées au Devis</h1>
+                <div class="badge">{html.escape(name)}</div>
+            </div>
+            
+            <div class="content">
+                <div class="info-box">
+                    <h3 style="margin-top: 0; color: {settings.primary_color};">🖼️ Photos de l'inventaire</h3>
+                    {rows}
+                </div>
+                
+                <div style="background: #e3f2fd; padding: 15px; border-radius: 8px; margin-top: 20px;">
+                    <p style="margin: 0; font-size: 14px; color: {settings.primary_color};">
+                        <strong>ℹ️ Devis:</strong> {html.escape(str(quote_data.get('id', 'N/A')))} ({html.escape(contact.get('email', 'N/A'))})
+                    </p>
+                </div>
+            </div>
+            
+            <div class="footer">
+                <p>{settings.company_name} | {settings.address}</p>
+                <p>Ce message a été généré automatiquement depuis le site web.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    # Send email
+    try:
+        params = {
+            "from": settings.from_email,
+            "to": [settings.company_email],
+            "subject": settings.attachments_subject.format(count=len(attachments), name=name),
+            "html": html_content
+        }
+        if contact.get('email'):
+            params["reply_to"] = contact['email']
+        
+        response = get_transport().send(params)
+        return {"success": True, "id": response.get("id")}
+    
+    except Exception as e:
+        print(f"Error sending attachments email: {str(e)}")
+        raise
+
+
+def get_email_stats() -> Dict[str, Any]:
+    """Latency and error counters of the active email transport"""
+    transport = get_transport()
+    return {"transport": transport.name, **transport.stats.snapshot()}
@@ -0,0 +1,303 @@
+"""
+Email Transports
+Pluggable backends used by email_service to deliver messages
+"""
+
+import os
+import abc
+import time
+import uuid
+import queue
+import smtplib
+import threading
+from collections import deque
+from email.message import EmailMessage
+from email.utils import make_msgid, parseaddr
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+
+RESEND_API_URL = "https://api.resend.com/emails"
+
+
+class TransportStats:
+    """Send latency and error counters for one transport"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.sent = 0
+        self.errors = 0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            if ok:
+                self.sent += 1
+            else:
+                self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus average/p50/p95 latency (ms) over the recent window"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            sent, errors = self.sent, self.errors
+        if not latencies:
+            return {"sent": sent, "errors": errors, "avg_ms": None, "p50_ms": None, "p95_ms": None}
+        return {
+            "sent": sent,
+            "errors": errors,
+            "avg_ms": round(1000 * sum(latencies) / len(latencies), 2),
+            "p50_ms": round(1000 * latencies[len(latencies) // 2], 2),
+            "p95_ms": round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        }
+
+
+class EmailTransport(abc.ABC):
+    """
+    Base class for email backends
+
+    Subclasses implement `_send`, which receives Resend-style params
+    (`from`, `to`, `subject`, `html`, optional `reply_to`) and returns the
+    provider message id.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.stats = TransportStats()
+
+    def send(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one message and record its latency"""
+        start = time.perf_counter()
+        try:
+            message_id = self._send(params)
+        except Exception:
+            self.stats.record(time.perf_counter() - start, ok=False)
+            raise
+        self.stats.record(time.perf_counter() - start, ok=True)
+        return {"id": message_id}
+
+    @abc.abstractmethod
+    def _send(self, params: Dict[str, Any]) -> str:
+        """Deliver one message and return the provider message id"""
+
+    def close(self) -> None:
+        """Release pooled connections"""
+
+
+class ResendTransport(EmailTransport):
+    """Resend HTTP API over a shared keep-alive httpx client"""
+
+    name = "resend"
+
+    def __init__(self, api_key: Optional[str] = None, timeout: float = 10.0):
+        super().__init__()
+        self._client = httpx.Client(
+            headers={"Authorization": f"Bearer {api_key or os.environ.get('RESEND_API_KEY', '')}"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10, keepalive_expiry=60.0),
+        )
+
+    def _send(self, params: Dict[str, Any]) -> str:
+        response = self._client.post(RESEND_API_URL, json=params)
+        if response.status_code >= 300:
+            raise RuntimeError(f"Resend API error {response.status_code}: {response.text}")
+        return response.json().get("id")
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class SmtpTransport(EmailTransport):
+    """
+    SMTP with a pool of persistent connections
+
+    Connections are created on demand up to `pool_size`, handed back to the
+    pool after each message and reused, so the TCP/TLS handshake and AUTH are
+    only paid once per connection. A connection idle longer than
+    `idle_check` seconds is probed with NOOP before reuse.
+    """
+
+    name = "smtp"
+
+    def __init__(self, host: str, port: int = 587, username: Optional[str] = None,
+                 password: Optional[str] = None, starttls: bool = True, use_ssl: bool = False,
+                 pool_size: int = 4, timeout: float = 10.0, idle_check: float = 30.0):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._pool: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            connection = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password or "")
+        return connection
+
+    def _acquire(self) -> Tuple[smtplib.SMTP, bool]:
+        """Return a connection and whether it was reused from the pool"""
+        try:
+            connection, last_used = self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect(), False
+        if time.monotonic() - last_used > self.idle_check:
+            try:
+                if connection.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("NOOP failed")
+            except OSError:  # includes SMTPException
+                self._discard(connection)
+                return self._connect(), False
+        return connection, True
+
+    def _release(self, connection: smtplib.SMTP) -> None:
+        self._pool.put((connection, time.monotonic()))
+
+    @staticmethod
+    def _discard(connection: smtplib.SMTP) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def build_message(params: Dict[str, Any]) -> EmailMessage:
+        """Convert Resend-style params into a MIME message"""
+        message = EmailMessage()
+        message["From"] = params["from"]
+        message["To"] = ", ".join(params["to"])
+        message["Subject"] = params["subject"]
+        # Message-ID in the sender's domain (each tenant sends from its own)
+        message["Message-ID"] = make_msgid(domain=parseaddr(params["from"])[1].rpartition("@")[2] or None)
+        if params.get("reply_to"):
+            message["Reply-To"] = params["reply_to"]
+        message.set_content("Ce message nécessite un client email compatible HTML.")
+        message.add_alternative(params["html"], subtype="html")
+        return message
+
+    def _send(self, params: Dict[str, Any]) -> str:
+        message = self.build_message(params)
+        with self._slots:
+            connection, reused = self._acquire()
+            try:
+                self._deliver(connection, message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                if not reused:
+                    raise
+                # Server dropped a pooled connection: retry once on a fresh one
+                connection = self._connect()
+                self._deliver(connection, message)
+        return message["Message-ID"]
+
+    def _deliver(self, connection: smtplib.SMTP, message: EmailMessage) -> None:
+        """
+        Send on one connection, then return it to the pool
+
+        A rejected message (4xx/5xx reply) leaves the session usable: it is
+        reset and pooled again, and the error is raised without a retry.
+        Any other failure discards the connection.
+        """
+        try:
+            connection.send_message(message)
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            try:
+                connection.rset()
+                self._release(connection)
+            except OSError:
+                self._discard(connection)
+            raise
+        except BaseException:
+            self._discard(connection)
+            raise
+        self._release(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                connection, _ = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                connection.quit()
+            except Exception:
+                self._discard(connection)
+
+
+class MemoryTransport(EmailTransport):
+    """Keeps sent messages in memory (tests and local development)"""
+
+    name = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self.outbox: List[Dict[str, Any]] = []
+
+    def _send(self, params: Dict[str, Any]) -> str:
+        message_id = str(uuid.uuid4())
+        self.outbox.append({"id": message_id, **params})
+        return message_id
+
+
+def create_transport(name: Optional[str] = None) -> EmailTransport:
+    """
+    Create the transport selected by EMAIL_TRANSPORT (resend, smtp or memory)
+
+    Raises:
+        ValueError: If the transport name is unknown or SMTP is not configured
+    """
+    name = (name or os.environ.get("EMAIL_TRANSPORT", "resend")).lower()
+
+    if name == "resend":
+        return ResendTransport()
+    if name == "memory":
+        return MemoryTransport()
+    if name == "smtp":
+        host = os.environ.get("SMTP_HOST")
+        if not host:
+            raise ValueError("SMTP transport selected but SMTP_HOST is not set")
+        return SmtpTransport(
+            host=host,
+            port=int(os.environ.get("SMTP_PORT", "587")),
+            username=os.environ.get("SMTP_USERNAME"),
+            password=os.environ.get("SMTP_PASSWORD"),
+            starttls=os.environ.get("SMTP_STARTTLS", "true").lower() == "true",
+            use_ssl=os.environ.get("SMTP_SSL", "false").lower() == "true",
+            pool_size=int(os.environ.get("SMTP_POOL_SIZE", "4")),
+        )
+    raise ValueError("Invalid EMAIL_TRANSPORT. Must be one of: resend, smtp, memory")
+
+
+# Global transport instance, created on first use
+_transport: Optional[EmailTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> EmailTransport:
+    """Get the configured email transport instance"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = create_transport()
+    return _transport
+
+
+def set_transport(transport: Optional[EmailTransport]) -> None:
+    """Replace the global transport (e.g. with a MemoryTransport in tests)"""
+    global _transport
+    with _transport_lock:
+        if _transport is not None and _transport is not transport:
+            _transport.close()
+        _transport = transport
@@ -0,0 +1,173 @@
+"""
+Event Stream
+In-process pub/sub that pushes new submissions to live ops-console clients
+"""
+
+import os
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import secrets
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+# Stream configuration
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "256"))  # per subscriber
+EVENT_REPLAY_SIZE = int(os.environ.get("EVENT_REPLAY_SIZE", "1000"))  # kept for Last-Event-ID resume
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get("EVENT_HEARTBEAT_SECONDS", "15"))
+EVENT_TOKEN_TTL = int(os.environ.get("EVENT_TOKEN_TTL", "300"))  # stream tokens, checked at connect only
+EVENT_SIGNING_KEY = os.environ.get("EVENT_SIGNING_KEY") or secrets.token_hex(32)
+
+
+def _sign_stream(tenant_id: str, expires: str) -> str:
+    message = f"{tenant_id}:{expires}".encode()
+    return hmac.new(EVENT_SIGNING_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def issue_stream_token(tenant_id: str, now: Optional[float] = None) -> str:
+    """Short-lived token opening one tenant's event stream (EventSource cannot send headers)"""
+    expires = str(int(now or time.time()) + EVENT_TOKEN_TTL)
+    return f"{expires}.{_sign_stream(tenant_id, expires)}"
+
+
+def verify_stream_token(tenant_id: str, token: Optional[str], now: Optional[float] = None) -> bool:
+    expires, _, signature = (token or "").partition(".")
+    if not expires.isdigit() or int(expires) < (now or time.time()):
+        return False
+    return hmac.compare_digest(signature.encode(), _sign_stream(tenant_id, expires).encode())
+
+
+@dataclass
+class StreamEvent:
+    """A published event, serialised once and shared by every subscriber"""
+    id: str  # "<epoch>-<seq>"
+    seq: int
+    type: str
+    json: str
+
+    @property
+    def sse(self) -> bytes:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.json}\n\n".encode("utf-8")
+
+
+class Subscriber:
+    """
+    One connected client
+
+    Holds the replayed backlog plus a bounded queue of live events. When the
+    queue overflows, the broker drops the subscriber: the stream ends and the
+    client reconnects with Last-Event-ID to resume from the replay buffer.
+    """
+
+    def __init__(self, backlog: List[StreamEvent], maxsize: int):
+        self.backlog = backlog
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    async def events(self, heartbeat: float = EVENT_HEARTBEAT_SECONDS) -> AsyncIterator[Optional[StreamEvent]]:
+        """Yield backlog then live events; yield None when idle for `heartbeat` seconds"""
+        for event in self.backlog:
+            yield event
+        self.backlog = []
+
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if event is None:
+                return
+            yield event
+
+
+class EventBroker:
+    """
+    Fan-out of new quotes, messages and leads to live subscribers
+
+    Event ids are ``<epoch>-<seq>``: the epoch is random per broker, so an id
+    from before a restart (or from another worker process) is recognised as
+    foreign instead of being compared with an unrelated sequence.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE, replay_size: int = EVENT_REPLAY_SIZE):
+        self.queue_size = queue_size
+        self.epoch = secrets.token_hex(4)
+        self._replay: Deque[StreamEvent] = deque(maxlen=replay_size)
+        self._subscribers: set = set()
+        self._next_id = 1
+        self.dropped_subscribers = 0
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> StreamEvent:
+        """
+        Publish an event to every subscriber without awaiting
+
+        Must be called from the event loop thread.
+        """
+        payload = {"type": event_type, "createdAt": datetime.utcnow().isoformat(), "data": data}
+        event = StreamEvent(id=f"{self.epoch}-{self._next_id}", seq=self._next_id, type=event_type,
+                            json=json.dumps(payload, default=str))
+        self._next_id += 1
+        self._replay.append(event)
+
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+        return event
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        """Disconnect a slow consumer: discard its queue and end its stream"""
+        self._subscribers.discard(subscriber)
+        subscriber.dropped = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+        self.dropped_subscribers += 1
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        """
+        Register a subscriber
+
+        Args:
+            last_event_id: Id of the last event the client received; newer
+                events still in the replay buffer are delivered first. An id
+                from another epoch replays the whole buffer, since the
+                client's position in it is unknown.
+        """
+        backlog: List[StreamEvent] = []
+        if last_event_id:
+            epoch, _, seq = last_event_id.rpartition("-")
+            if epoch == self.epoch and seq.isdigit():
+                backlog = [event for event in self._replay if event.seq > int(seq)]
+            else:
+                backlog = list(self._replay)
+
+        subscriber = Subscriber(backlog, self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    async def sse(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Server-Sent Events body for one client"""
+        subscriber = self.subscribe(last_event_id)
+        try:
+            yield b"retry: 3000\n\n"
+            async for event in subscriber.events():
+                yield event.sse if event is not None else b": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "dropped_subscribers": self.dropped_subscribers,
+            "last_event_id": f"{self.epoch}-{self._next_id - 1}" if self._next_id > 1 else None,
+        }
@@ -0,0 +1,225 @@
+"""
+Export Service
+Streams quotes, messages and leads to CSV or Parquet in fixed-size chunks
+"""
+
+import io
+import csv
+from bisect import bisect_right
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_ENABLED = True
+except ImportError:
+    PARQUET_ENABLED = False
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Column layout per collection: (column name, type). Nested objects such as
+# `contact` are flattened into dotted columns (`contact.email`).
+EXPORT_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "quotes": [
+        ("id", "string"),
+        ("createdAt", "string"),
+        ("status", "string"),
+        ("serviceId", "string"),
+        ("date", "string"),
+        ("contact.name", "string"),
+        ("contact.email", "string"),
+        ("contact.phone", "string"),
+        ("fromZip", "string"),
+        ("toZip", "string"),
+        ("volume", "int"),
+        ("rooms", "float"),
+        ("housingType", "string"),
+        ("surface", "int"),
+        ("duration", "string"),
+        ("floor", "int"),
+    ],
+    "messages": [
+        ("id", "string"),
+        ("createdAt", "string"),
+        ("status", "string"),
+        ("name", "string"),
+        ("email", "string"),
+        ("subject", "string"),
+        ("message", "string"),
+    ],
+    "leads": [
+        ("id", "string"),
+        ("createdAt", "string"),
+        ("status", "string"),
+        ("companyName", "string"),
+        ("contactName", "string"),
+        ("email", "string"),
+        ("phone", "string"),
+        ("employeeCount", "string"),
+        ("serviceNeeds", "string"),
+    ],
+}
+
+
+def flatten_record(record: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """
+    Flatten nested dictionaries into dotted keys
+
+    Example: {"contact": {"email": "a@b.ch"}} -> {"contact.email": "a@b.ch"}
+    """
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, prefix=f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def iter_chunks(collection: Dict[str, dict], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                since: Optional[str] = None,
+                until: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield flattened records of a collection in chunks of at most chunk_size
+
+    Only the ids are snapshotted up front; records are read and flattened one
+    chunk at a time so memory stays proportional to the chunk size.
+
+    Args:
+        collection: Mapping of record id to record, in insertion (createdAt) order
+        chunk_size: Number of records per chunk
+        since: Only export records created strictly after this ISO timestamp (cursor)
+        until: Only export records created at or before this timestamp, so that
+            records added while the export runs are left for the next one
+    """
+    ids = list(collection)
+
+    def created_at(record_id: str) -> str:
+        # Retention may evict head records while the export runs in its
+        # thread; they were the oldest, so "" keeps the ids sorted
+        record = collection.get(record_id)
+        return record["createdAt"] if record is not None else ""
+
+    start = bisect_right(ids, since, key=created_at) if since else 0
+    end = bisect_right(ids, until, key=created_at) if until else len(ids)
+
+    for offset in range(start, end, chunk_size):
+        chunk = []
+        for record_id in ids[offset:min(offset + chunk_size, end)]:
+            record = collection.get(record_id)
+            if record is not None:
+                chunk.append({"id": record_id, **flatten_record(record)})
+        if chunk:
+            yield chunk
+
+
+def export_cursor(collection: Dict[str, dict]) -> Optional[str]:
+    """Return the cursor to pass as `since` in the next incremental export"""
+    if not collection:
+        return None
+    last_id = next(reversed(collection))
+    return collection[last_id]["createdAt"]
+
+
+def stream_csv(chunks: Iterator[List[Dict[str, Any]]], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    """Encode chunks as CSV, yielding one bytes block per chunk"""
+    names = [name for name, _ in columns]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=names, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file object that hands out written bytes and tracks the offset"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _arrow_schema(columns: List[Tuple[str, str]]):
+    types = {"string": pa.string(), "int": pa.int64(), "float": pa.float64()}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def stream_parquet(chunks: Iterator[List[Dict[str, Any]]], columns: List[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    Encode chunks as Parquet, one row group per chunk
+
+    Raises:
+        RuntimeError: If pyarrow is not installed
+    """
+    if not PARQUET_ENABLED:
+        raise RuntimeError("Parquet export requires pyarrow")
+
+    schema = _arrow_schema(columns)
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for chunk in chunks:
+            arrays = {name: [row.get(name) for row in chunk] for name in schema.names}
+            writer.write_table(pa.Table.from_pydict(arrays, schema=schema))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_collection(collection: Dict[str, dict], name: str, fmt: str = "csv",
+                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      since: Optional[str] = None,
+                      until: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Stream a whole collection as CSV or Parquet
+
+    Args:
+        collection: Mapping of record id to record
+        name: Collection name ("quotes", "messages" or "leads")
+        fmt: "csv" or "parquet"
+        chunk_size: Number of records encoded per chunk
+        since: Optional cursor for incremental exports
+        until: Optional upper bound, usually the cursor returned to the client
+
+    Raises:
+        ValueError: If the collection or format is unknown
+        RuntimeError: If Parquet is requested and pyarrow is not installed
+    """
+    if name not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown collection. Must be one of: {', '.join(EXPORT_COLUMNS)}")
+
+    if fmt == "parquet" and not PARQUET_ENABLED:
+        raise RuntimeError("Parquet export requires pyarrow")
+
+    chunks = iter_chunks(collection, chunk_size=chunk_size, since=since, until=until)
+    if fmt == "csv":
+        return stream_csv(chunks, EXPORT_COLUMNS[name])
+    if fmt == "parquet":
+        return stream_parquet(chunks, EXPORT_COLUMNS[name])
+    raise ValueError("Invalid format. Must be one of: csv, parquet")
@@ -3,55 +3,237 @@ Batimove Backend API
 FastAPI application for Batimove SaaS platform
 """
 
+import gc
 import os
+import hmac
 import uuid
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel, EmailStr, Field
 
-from fastapi import FastAPI, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+
+from tenant_service import TenantConfig, get_registry
 
 # Import email service
 try:
-    from email_service import send_quote_email, send_contact_email
+    from email_service import send_quote_email, send_contact_email, send_attachments_email, get_email_stats, EmailSettings
+    from email_transport import set_transport
     EMAIL_ENABLED = True
 except ImportError:
     EMAIL_ENABLED = False
     print("Warning: email_service not available. Emails will not be sent.")
 
+# Import webhook service
+try:
+    from webhook_service import get_dispatcher
+    webhooks = get_dispatcher()
+    WEBHOOKS_ENABLED = True
+except ImportError:
+    WEBHOOKS_ENABLED = False
+    print("Warning: webhook_service not available. Webhooks will not be sent.")
+
+# Import export service
+try:
+    from export_service import export_collection, export_cursor
+    EXPORT_ENABLED = True
+except ImportError:
+    EXPORT_ENABLED = False
+    print("Warning: export_service not available. Exports are disabled.")
+
+# Import live event stream
+try:
+    from event_stream import EVENT_TOKEN_TTL, EventBroker, issue_stream_token, verify_stream_token
+    EVENTS_ENABLED = True
+except ImportError:
+    EVENTS_ENABLED = False
+    print("Warning: event_stream not available. Live events are disabled.")
+
+# Import store persistence
+try:
+    from store_persistence import StorePersistence, snapshot_path
+    PERSISTENCE_ENABLED = True
+except ImportError:
+    PERSISTENCE_ENABLED = False
+    print("Warning: store_persistence not available. Data is lost on restart.")
+
+# Import attachment service
+try:
+    from attachment_service import (
+        AttachmentError, ATTACHMENT_MAX_BYTES, ATTACHMENT_MAX_PER_QUOTE,
+        quote_directory, save_stream, iter_multipart_files, finalize_upload, extract_metadata, shutdown_pool,
+        sign_attachment, verify_attachment_token,
+    )
+    ATTACHMENTS_ENABLED = True
+except ImportError:
+    ATTACHMENTS_ENABLED = False
+    print("Warning: attachment_service not available. Photo uploads are disabled.")
+
+# Import document service
+try:
+    from document_service import document_data, document_key, get_document_service
+    documents = get_document_service()
+    DOCUMENTS_ENABLED = True
+except ImportError:
+    DOCUMENTS_ENABLED = False
+    print("Warning: document_service not available. Quote documents are disabled.")
+
+# Import spam filter
+try:
+    from spam_filter import get_spam_filter, issue_form_token
+    SPAM_FILTER_ENABLED = True
+except ImportError:
+    SPAM_FILTER_ENABLED = False
+    print("Warning: spam_filter not available. Submissions are not filtered.")
+
+# Base URL used in links sent by email; a tenant's public_base_url takes
+# precedence. Never derived from the request: its Host header is client-controlled.
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "")
+# Photos uploaded within this many seconds are announced in a single email
+ATTACHMENT_NOTIFY_DELAY = float(os.environ.get("ATTACHMENT_NOTIFY_DELAY", "30"))
+# Longest wait at shutdown for photo processing and pending photo emails
+SHUTDOWN_DRAIN_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_SECONDS", "10"))
+
+# Admin endpoints (exports, ...) require this key, or the tenant's own
+# admin_api_key, in the X-API-Key header
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY", "")
+
 # Simple in-memory database
 class MockDB:
+    COLLECTIONS = ("quotes", "messages", "leads", "quarantine", "attachments")
+    
     def __init__(self):
         self.quotes = {}
         self.messages = {}
         self.leads = {}
+        self.quarantine = {}
+        self.attachments = {}
     
     def add_quote(self, data):
         id = str(uuid.uuid4())
-        self.quotes[id] = {**data, "createdAt": datetime.utcnow().isoformat()}
+        self.quotes[id] = {**data, "createdAt": datetime.utcnow().isoformat(), "status": "pending"}
         return id
     
     def add_message(self, data):
         id = str(uuid.uuid4())
-        self.messages[id] = {**data, "createdAt": datetime.utcnow().isoformat()}
+        self.messages[id] = {**data, "createdAt": datetime.utcnow().isoformat(), "status": "unread"}
         return id
     
     def add_lead(self, data):
         id = str(uuid.uuid4())
-        self.leads[id] = {**data, "createdAt": datetime.utcnow().isoformat()}
+        self.leads[id] = {**data, "createdAt": datetime.utcnow().isoformat(), "status": "new"}
+        return id
+    
+    def add_attachment(self, data):
+        id = str(uuid.uuid4())
+        self.attachments[id] = {**data, "createdAt": datetime.utcnow().isoformat()}
         return id
+    
+    def add_quarantined(self, kind, data, verdict):
+        id = str(uuid.uuid4())
+        self.quarantine[id] = {
+            "kind": kind,
+            "data": data,
+            "score": verdict.score,
+            "reasons": verdict.reasons,
+            "createdAt": datetime.utcnow().isoformat()
+        }
+        return id
+
+class TenantPartition:
+    """Store, persistence, live events and email settings of one tenant"""
+    
+    def __init__(self, config: TenantConfig):
+        self.id = config.id
+        self.db = MockDB()
+        self.events = EventBroker() if EVENTS_ENABLED else None
+        self.persistence = (
+            StorePersistence(self.db, path=snapshot_path(config.id, tenants.default_id))
+            if PERSISTENCE_ENABLED else None
+        )
+        self.configure(config)
+    
+    def configure(self, config: TenantConfig):
+        self.config = config
+        self.email_settings = EmailSettings.from_dict(config.email) if EMAIL_ENABLED else None
+    
+    async def open(self, startup: bool = False):
+        if self.persistence:
+            # The partition is not shared yet: load it in a thread so a large
+            # snapshot does not stall requests of other tenants
+            await asyncio.to_thread(self._restore, startup)
+            self.persistence.start()
+    
+    def _restore(self, startup: bool):
+        # Pausing the garbage collector is process-wide: only before serving
+        self.persistence.restore(pause_gc=startup)
+        self.persistence.enforce_retention()
+    
+    async def close(self):
+        if self.persistence:
+            await self.persistence.stop()
+
+tenants = get_registry()
+partitions = {}
+opening_partitions = {}
 
-db = MockDB()
+async def open_partition(config: TenantConfig, startup: bool = False) -> TenantPartition:
+    partition = TenantPartition(config)
+    try:
+        await partition.open(startup)
+        partitions[config.id] = partition
+    finally:
+        opening_partitions.pop(config.id, None)
+    return partition
+
+async def get_partition(config: TenantConfig) -> TenantPartition:
+    """Get (or create and restore) the partition of a tenant"""
+    partition = partitions.get(config.id)
+    if partition is None:
+        # Concurrent first requests of a new tenant wait for the same restore
+        opening = opening_partitions.get(config.id)
+        if opening is None:
+            opening = opening_partitions[config.id] = asyncio.create_task(open_partition(config))
+        return await asyncio.shield(opening)
+    if partition.config is not config:
+        # Tenant config was hot-reloaded
+        partition.configure(config)
+    return partition
+
+async def resolve_tenant(host: Optional[str], tenant_id: Optional[str]) -> TenantPartition:
+    config = tenants.resolve(host=host, tenant_id=tenant_id)
+    if config is None:
+        raise HTTPException(status_code=404, detail="Unknown tenant")
+    return await get_partition(config)
+
+async def get_tenant(request: Request) -> TenantPartition:
+    """Resolve the tenant from the X-Tenant-ID header, else from the Host header"""
+    return await resolve_tenant(request.headers.get("host"), request.headers.get("x-tenant-id"))
+
+async def rate_limited_tenant(tenant: TenantPartition = Depends(get_tenant)) -> TenantPartition:
+    """Resolve the tenant and consume one request from its rate limit"""
+    if not tenants.allow(tenant.config):
+        raise HTTPException(status_code=429, detail="Too many requests")
+    return tenant
 
 # Models
+class SpamTrapFields(BaseModel):
+    # Hidden honeypot input (left empty by humans) and token from GET /api/form-token
+    website: Optional[str] = None
+    formToken: Optional[str] = None
+
+SPAM_TRAP_FIELDS = {"website", "formToken"}
+
 class ContactInfo(BaseModel):
     name: str
     email: EmailStr
     phone: str
 
-class QuoteData(BaseModel):
+class QuoteData(SpamTrapFields):
     serviceId: str
     date: str
     contact: ContactInfo
@@ -64,13 +246,13 @@ class QuoteData(BaseModel):
     duration: Optional[str] = None
     floor: Optional[int] = None
 
-class ContactMessage(BaseModel):
+class ContactMessage(SpamTrapFields):
     name: str
     email: EmailStr
     subject: str
     message: str
 
-class BusinessLead(BaseModel):
+class BusinessLead(SpamTrapFields):
     companyName: str
     contactName: str
     email: EmailStr
@@ -78,8 +260,100 @@ class BusinessLead(BaseModel):
     employeeCount: Optional[str] = None
     serviceNeeds: str
 
+class QuoteStatusUpdate(BaseModel):
+    status: str = Field(..., pattern="^(pending|confirmed|cancelled|completed)$")
+
+def require_admin(api_key: Optional[str], tenant: Optional[TenantPartition] = None):
+    """Reject the request unless it carries the global or the tenant's admin API key"""
+    keys = [key for key in (ADMIN_API_KEY, tenant.config.admin_api_key if tenant else None) if key]
+    if not keys:
+        raise HTTPException(status_code=503, detail="Admin API is not configured")
+    # Compared as bytes: compare_digest rejects non-ASCII str with TypeError
+    if not api_key or not any(hmac.compare_digest(api_key.encode(), key.encode()) for key in keys):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+def screen_submission(tenant: TenantPartition, kind: str, form: SpamTrapFields, email: str, text: str = ""):
+    """
+    Run the spam filter on a submission
+
+    Returns the quarantine id if the submission was flagged (it is then stored
+    in the tenant's quarantine only, and neither emailed nor published), else None.
+    """
+    if not SPAM_FILTER_ENABLED:
+        return None
+    verdict = get_spam_filter().check(
+        email=email, text=text, honeypot=form.website, form_token=form.formToken
+    )
+    if not verdict.is_spam:
+        return None
+    return tenant.db.add_quarantined(kind, form.dict(exclude=SPAM_TRAP_FIELDS), verdict)
+
+def publish_event(tenant: TenantPartition, event_type: str, record_id: str, data: dict):
+    """Fan a new record out to webhooks and live subscribers without blocking the request"""
+    payload = {"id": record_id, **data}
+    if WEBHOOKS_ENABLED:
+        try:
+            webhooks.publish(event_type, payload, tenant=tenant.id)
+        except Exception as webhook_error:
+            print(f"Webhook publish failed: {str(webhook_error)}")
+    if tenant.events:
+        try:
+            tenant.events.publish(event_type, payload)
+        except Exception as event_error:
+            print(f"Live event publish failed: {str(event_error)}")
+
+async def drain_background_tasks(timeout: float = SHUTDOWN_DRAIN_SECONDS):
+    """Let photo processing finish and send pending photo emails, then cancel what is left"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    # Processing first, so a burst of uploads still ends in a single email per quote
+    notifications = set(pending_notifications.values())
+    processing = [task for task in background_tasks if task not in notifications]
+    if processing:
+        await asyncio.wait(processing, timeout=timeout)
+    flush_notifications.set()
+    if background_tasks:
+        await asyncio.wait(list(background_tasks), timeout=max(0.0, deadline - loop.time()))
+    leftover = list(background_tasks)
+    if leftover:
+        print(f"Shutdown: cancelling {len(leftover)} background task(s)")
+        for task in leftover:
+            task.cancel()
+        await asyncio.gather(*leftover, return_exceptions=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global flush_notifications
+    flush_notifications = asyncio.Event()  # fresh per run: an Event is bound to one loop
+    for config in list(tenants.tenants.values()):
+        if config.id not in partitions:
+            await open_partition(config, startup=True)
+    # Move the restored records out of the collector's reach for later full
+    # collections. Once, before serving: freezing later would also make
+    # in-flight garbage permanent.
+    gc.freeze()
+    if WEBHOOKS_ENABLED:
+        webhooks.load_from_env(tenants.default_id)
+        await webhooks.start()
+    yield
+    await drain_background_tasks()
+    if WEBHOOKS_ENABLED:
+        await webhooks.stop()
+    if EMAIL_ENABLED:
+        set_transport(None)
+    for partition in list(partitions.values()):
+        try:
+            await partition.close()
+        except Exception as e:
+            # Keep going: the other tenants still need their final snapshot
+            print(f"Closing tenant {partition.id} failed: {str(e)}")
+    if ATTACHMENTS_ENABLED:
+        shutdown_pool()
+    if DOCUMENTS_ENABLED:
+        documents.shutdown()
+
 # Initialize FastAPI
-app = FastAPI(title="Batimove API", version="1.0.0")
+app = FastAPI(title="Batimove API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -108,16 +382,33 @@ async def api_root():
         }
     }
 
+@app.get("/api/form-token")
+async def form_token():
+    """Server-timestamped token for the formToken field of the public forms"""
+    if not SPAM_FILTER_ENABLED:
+        return {"token": None}
+    return {"token": issue_form_token()}
+
 @app.post("/api/quote", status_code=status.HTTP_201_CREATED)
-async def create_quote(quote_data: QuoteData):
+async def create_quote(quote_data: QuoteData, tenant: TenantPartition = Depends(rate_limited_tenant)):
     try:
+        quarantine_id = screen_submission(tenant, "quote", quote_data, quote_data.contact.email)
+        if quarantine_id:
+            return {
+                "success": True,
+                "quoteId": quarantine_id,
+                "message": "Votre demande de devis a été enregistrée avec succès."
+            }
+        
         # Save to database
-        doc_id = db.add_quote(quote_data.dict())
+        data = quote_data.dict(exclude=SPAM_TRAP_FIELDS)
+        doc_id = tenant.db.add_quote(data)
+        publish_event(tenant, "quote.created", doc_id, tenant.db.quotes[doc_id])
         
         # Send email notification
         if EMAIL_ENABLED:
             try:
-                send_quote_email(quote_data.dict())
+                await asyncio.to_thread(send_quote_email, data, tenant.email_settings)
             except Exception as email_error:
                 print(f"Email sending failed: {str(email_error)}")
                 # Continue even if email fails
@@ -134,15 +425,27 @@ async def create_quote(quote_data: QuoteData):
         )
 
 @app.post("/api/contact", status_code=status.HTTP_201_CREATED)
-async def create_contact(contact: ContactMessage):
+async def create_contact(contact: ContactMessage, tenant: TenantPartition = Depends(rate_limited_tenant)):
     try:
+        quarantine_id = screen_submission(
+            tenant, "message", contact, contact.email, f"{contact.subject}\n{contact.message}"
+        )
+        if quarantine_id:
+            return {
+                "success": True,
+                "messageId": quarantine_id,
+                "message": "Votre message a été envoyé avec succès."
+            }
+        
         # Save to database
-        doc_id = db.add_message(contact.dict())
+        data = contact.dict(exclude=SPAM_TRAP_FIELDS)
+        doc_id = tenant.db.add_message(data)
+        publish_event(tenant, "message.created", doc_id, tenant.db.messages[doc_id])
         
         # Send email notification
         if EMAIL_ENABLED:
             try:
-                send_contact_email(contact.dict())
+                await asyncio.to_thread(send_contact_email, data, tenant.email_settings)
             except Exception as email_error:
                 print(f"Email sending failed: {str(email_error)}")
                 # Continue even if email fails
@@ -159,9 +462,21 @@ async def create_contact(contact: ContactMessage):
         )
 
 @app.post("/api/business", status_code=status.HTTP_201_CREATED)
-async def create_business(business_lead: BusinessLead):
+async def create_business(business_lead: BusinessLead, tenant: TenantPartition = Depends(rate_limited_tenant)):
     try:
-        doc_id = db.add_lead(business_lead.dict())
+        quarantine_id = screen_submission(
+            tenant, "lead", business_lead, business_lead.email,
+            f"{business_lead.companyName}\n{business_lead.serviceNeeds}"
+        )
+        if quarantine_id:
+            return {
+                "success": True,
+                "leadId": quarantine_id,
+                "message": "Merci pour votre intérêt. Notre équipe vous contactera sous 48h."
+            }
+        
+        doc_id = tenant.db.add_lead(business_lead.dict(exclude=SPAM_TRAP_FIELDS))
+        publish_event(tenant, "lead.created", doc_id, tenant.db.leads[doc_id])
         return {
             "success": True,
             "leadId": doc_id,
@@ -173,4 +488,357 @@ async def create_business(business_lead: BusinessLead):
             content={"success": False, "error": str(e)}
         )
 
+@app.get("/api/admin/stats")
+async def admin_stats(tenant: TenantPartition = Depends(get_tenant), x_api_key: Optional[str] = Header(None)):
+    require_admin(x_api_key, tenant)
+    stats = {
+        "tenant": tenant.id,
+        "events": tenant.events.get_stats() if tenant.events else None,
+        "store": {
+            **{name: len(getattr(tenant.db, name)) for name in tenant.db.COLLECTIONS},
+            **(tenant.persistence.stats if tenant.persistence else {}),
+        },
+    }
+    # Process-wide counters are only shown with the global key
+    if ADMIN_API_KEY and hmac.compare_digest(x_api_key.encode(), ADMIN_API_KEY.encode()):
+        stats["tenants"] = len(partitions)
+        stats["email"] = get_email_stats() if EMAIL_ENABLED else None
+        stats["webhooks"] = webhooks.get_stats() if WEBHOOKS_ENABLED else None
+        stats["documents"] = documents.get_stats() if DOCUMENTS_ENABLED else None
+    return stats
+
+def require_stream_access(tenant: TenantPartition, token: Optional[str], api_key: Optional[str]):
+    """Accept a stream token from POST /api/events/token, else require the admin key header"""
+    if token and verify_stream_token(tenant.id, token):
+        return
+    require_admin(api_key, tenant)
+
+@app.post("/api/events/token")
+async def event_stream_token(tenant: TenantPartition = Depends(get_tenant), x_api_key: Optional[str] = Header(None)):
+    require_admin(x_api_key, tenant)
+    if not tenant.events:
+        raise HTTPException(status_code=503, detail="Live events not available")
+    return {"token": issue_stream_token(tenant.id), "expiresIn": EVENT_TOKEN_TTL}
+
+@app.get("/api/events")
+async def event_stream(
+    tenant: TenantPartition = Depends(get_tenant),
+    token: Optional[str] = Query(None, description="Stream token from POST /api/events/token"),
+    lastEventId: Optional[str] = Query(None, description="Resume point when reconnecting with a new token"),
+    x_api_key: Optional[str] = Header(None),
+    last_event_id: Optional[str] = Header(None),
+):
+    if not tenant.events:
+        raise HTTPException(status_code=503, detail="Live events not available")
+    require_stream_access(tenant, token, x_api_key)
+    return StreamingResponse(
+        tenant.events.sse(last_event_id or lastEventId),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/api/events/ws")
+async def event_stream_ws(websocket: WebSocket, token: Optional[str] = None,
+                          lastEventId: Optional[str] = None, tenant: Optional[str] = None):
+    try:
+        partition = await resolve_tenant(websocket.headers.get("host"),
+                                         websocket.headers.get("x-tenant-id") or tenant)
+        events = partition.events
+        if not events:
+            await websocket.close(code=1011)
+            return
+        require_stream_access(partition, token, websocket.headers.get("x-api-key"))
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    subscriber = events.subscribe(lastEventId)
+    try:
+        async for event in subscriber.events():
+            if event is None:
+                await websocket.send_text('{"type": "ping"}')
+            else:
+                await websocket.send_text(f'{{"id": "{event.id}", "event": {event.json}}}')
+        # Dropped as a slow consumer: client should reconnect with lastEventId
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        events.unsubscribe(subscriber)
+
+@app.get("/api/admin/quarantine")
+async def list_quarantine(tenant: TenantPartition = Depends(get_tenant), x_api_key: Optional[str] = Header(None)):
+    require_admin(x_api_key, tenant)
+    quarantine = tenant.db.quarantine
+    return {"count": len(quarantine), "items": [{"id": k, **v} for k, v in quarantine.items()]}
+
+@app.get("/api/export/{collection}")
+async def export_data(
+    collection: str,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    since: Optional[str] = Query(None, description="Cursor from a previous export (createdAt)"),
+    chunk_size: int = Query(5000, ge=100, le=50000),
+    tenant: TenantPartition = Depends(get_tenant),
+    x_api_key: Optional[str] = Header(None),
+):
+    require_admin(x_api_key, tenant)
+    if not EXPORT_ENABLED:
+        raise HTTPException(status_code=503, detail="Export service not available")
+
+    db = tenant.db
+    collections = {"quotes": db.quotes, "messages": db.messages, "leads": db.leads}
+    if collection not in collections:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+
+    records = collections[collection]
+    cursor = export_cursor(records)
+    try:
+        body = export_collection(records, collection, fmt=format, chunk_size=chunk_size,
+                                 since=since, until=cursor)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    extension = "parquet" if format == "parquet" else "csv"
+    headers = {"Content-Disposition": f'attachment; filename="{collection}.{extension}"'}
+    if cursor:
+        headers["X-Export-Cursor"] = cursor
+    media_type = "application/vnd.apache.parquet" if format == "parquet" else "text/csv; charset=utf-8"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+# Background work (thumbnails, delayed emails) must stay referenced until done
+background_tasks = set()
+pending_notifications = {}
+# Set at shutdown: debounced photo emails are sent without waiting
+flush_notifications = asyncio.Event()
+
+def run_in_background(coroutine):
+    task = asyncio.create_task(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def raw_upload(request: Request):
+    """The request body as a single upload, named by the `filename` query parameter"""
+    yield request.query_params.get("filename"), request.stream()
+
+def attachment_url(tenant: TenantPartition, quote_id: str, attachment_id: str,
+                   thumbnail: bool = False) -> Optional[str]:
+    """Signed link to an attachment, or None if no public base URL is configured"""
+    base_url = tenant.config.public_base_url or PUBLIC_BASE_URL
+    if not base_url:
+        return None
+    token = sign_attachment(tenant.id, attachment_id)
+    url = f"{base_url.rstrip('/')}/api/quotes/{quote_id}/attachments/{attachment_id}?token={token}"
+    if tenant.id != tenants.default_id:
+        url += f"&tenant={tenant.id}"
+    return url + ("&thumbnail=true" if thumbnail else "")
+
+async def process_attachment(tenant: TenantPartition, attachment_id: str):
+    """Extract metadata and the thumbnail in the process pool, then schedule the email"""
+    record = tenant.db.attachments.get(attachment_id)
+    if record is None:
+        return
+    try:
+        metadata = await extract_metadata(record["path"])
+        status_value = "ready"
+    except Exception as e:
+        print(f"Attachment processing failed: {str(e)}")
+        metadata, status_value = {}, "failed"
+    if attachment_id in tenant.db.attachments:
+        tenant.db.attachments[attachment_id] = {**record, **metadata, "status": status_value}
+
+    # Debounce: one email per burst of uploads on the same quote
+    key = (tenant.id, record["quoteId"])
+    previous = pending_notifications.get(key)
+    if previous is not None:
+        previous.cancel()
+    pending_notifications[key] = run_in_background(
+        notify_attachments(tenant, record["quoteId"])
+    )
+
+async def notify_attachments(tenant: TenantPartition, quote_id: str):
+    try:
+        await asyncio.wait_for(flush_notifications.wait(), ATTACHMENT_NOTIFY_DELAY)
+    except asyncio.TimeoutError:
+        pass
+    pending_notifications.pop((tenant.id, quote_id), None)
+    quote = tenant.db.quotes.get(quote_id)
+    if quote is None or not EMAIL_ENABLED:
+        return
+
+    pending = []
+    for attachment_id in quote.get("attachmentIds", []):
+        record = tenant.db.attachments.get(attachment_id)
+        if record is None or record.get("notified") or record.get("status") == "processing":
+            continue
+        pending.append({
+            "filename": record.get("filename"),
+            "size": record.get("size", 0),
+            "url": attachment_url(tenant, quote_id, attachment_id),
+            "thumbnailUrl": (
+                attachment_url(tenant, quote_id, attachment_id, thumbnail=True)
+                if record.get("thumbnail") else None
+            ),
+        })
+        tenant.db.attachments[attachment_id] = {**record, "notified": True}
+    if not pending:
+        return
+    if pending[0]["url"] is None:
+        print(f"PUBLIC_BASE_URL not set: photo email for tenant {tenant.id} sent without links")
+
+    try:
+        await asyncio.to_thread(send_attachments_email, {"id": quote_id, **quote}, pending, tenant.email_settings)
+    except Exception as email_error:
+        print(f"Email sending failed: {str(email_error)}")
+
+@app.post("/api/quotes/{quote_id}/attachments", status_code=status.HTTP_201_CREATED)
+async def upload_attachments(quote_id: str, request: Request,
+                             tenant: TenantPartition = Depends(rate_limited_tenant)):
+    """
+    Upload inventory photos for a quote
+
+    Either a raw body (Content-Type image/jpeg, image/png or image/webp,
+    optionally chunked, file name in the `filename` query parameter) or a
+    multipart/form-data form with one or more `files`.
+    """
+    if not ATTACHMENTS_ENABLED:
+        raise HTTPException(status_code=503, detail="Attachments not available")
+    quote = tenant.db.quotes.get(quote_id)
+    if quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > ATTACHMENT_MAX_BYTES * ATTACHMENT_MAX_PER_QUOTE:
+        raise HTTPException(status_code=413, detail="Upload too large")
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        # Parsed as it arrives: each file part goes straight to save_stream
+        uploads = iter_multipart_files(request.stream(), content_type)
+    else:
+        uploads = raw_upload(request)
+
+    directory = quote_directory(tenant.id, quote_id)
+    created = []
+    try:
+        async for filename, chunks in uploads:
+            if len(quote.get("attachmentIds", [])) >= ATTACHMENT_MAX_PER_QUOTE:
+                raise HTTPException(status_code=413, detail=f"At most {ATTACHMENT_MAX_PER_QUOTE} files per quote")
+            temp_path, size, detected_type = await save_stream(chunks, directory)
+
+            attachment_id = tenant.db.add_attachment({
+                "quoteId": quote_id,
+                "filename": os.path.basename(filename or "") or None,
+                "contentType": detected_type,
+                "size": size,
+                "status": "processing",
+            })
+            path = finalize_upload(temp_path, attachment_id, detected_type)
+            tenant.db.attachments[attachment_id]["path"] = path
+            quote = tenant.db.quotes[quote_id] = {**quote, "attachmentIds": [*quote.get("attachmentIds", []), attachment_id]}
+
+            run_in_background(process_attachment(tenant, attachment_id))
+            created.append({"attachmentId": attachment_id, "contentType": detected_type, "size": size})
+    except AttachmentError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if not created:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+
+    return {"success": True, "attachments": created}
+
+@app.get("/api/quotes/{quote_id}/attachments")
+async def list_attachments(quote_id: str, tenant: TenantPartition = Depends(get_tenant),
+                           x_api_key: Optional[str] = Header(None)):
+    require_admin(x_api_key, tenant)
+    quote = tenant.db.quotes.get(quote_id)
+    if quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    items = []
+    for attachment_id in quote.get("attachmentIds", []):
+        record = tenant.db.attachments.get(attachment_id)
+        if record is not None:
+            items.append({"id": attachment_id, **{k: v for k, v in record.items() if k not in ("path", "thumbnail")}})
+    return {"count": len(items), "items": items}
+
+@app.get("/api/quotes/{quote_id}/attachments/{attachment_id}")
+async def get_attachment(quote_id: str, attachment_id: str, request: Request,
+                         token: Optional[str] = None, thumbnail: bool = False, tenant: Optional[str] = None,
+                         x_api_key: Optional[str] = Header(None)):
+    """Serve a photo (HTTP Range requests supported) to admins or via a signed email link"""
+    partition = await resolve_tenant(request.headers.get("host"), request.headers.get("x-tenant-id") or tenant)
+    if not ATTACHMENTS_ENABLED or not verify_attachment_token(partition.id, attachment_id, token):
+        require_admin(x_api_key, partition)
+
+    record = partition.db.attachments.get(attachment_id)
+    if record is None or record.get("quoteId") != quote_id:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    if thumbnail:
+        if not record.get("thumbnail"):
+            raise HTTPException(status_code=404, detail="Thumbnail not available")
+        return FileResponse(record["thumbnail"], media_type="image/jpeg")
+    return FileResponse(record["path"], media_type=record["contentType"], filename=record.get("filename"),
+                        content_disposition_type="inline")
+
+@app.put("/api/quotes/{quote_id}/status")
+async def update_quote_status(quote_id: str, update: QuoteStatusUpdate,
+                              tenant: TenantPartition = Depends(get_tenant),
+                              x_api_key: Optional[str] = Header(None)):
+    require_admin(x_api_key, tenant)
+    quote = tenant.db.quotes.get(quote_id)
+    if quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    quote = tenant.db.quotes[quote_id] = {**quote, "status": update.status}
+    publish_event(tenant, "quote.updated", quote_id, quote)
+    return {"success": True, "quoteId": quote_id, "status": update.status}
+
+def quote_document_data(tenant: TenantPartition, quote_id: str, quote: dict) -> dict:
+    return document_data(tenant.id, quote_id, quote, tenant.email_settings)
+
+@app.get("/api/quotes/{quote_id}/document")
+async def get_quote_document(quote_id: str, tenant: TenantPartition = Depends(get_tenant),
+                             x_api_key: Optional[str] = Header(None),
+                             if_none_match: Optional[str] = Header(None)):
+    """Branded PDF of a quote, rendered on first request and cached until the quote changes"""
+    require_admin(x_api_key, tenant)
+    if not DOCUMENTS_ENABLED:
+        raise HTTPException(status_code=503, detail="Documents not available")
+    quote = tenant.db.quotes.get(quote_id)
+    if quote is None:
+        raise HTTPException(status_code=404, detail="Quote not found")
+
+    data = quote_document_data(tenant, quote_id, quote)
+    key = document_key(data)
+    headers = {"ETag": f'"{key}"', "Cache-Control": "private, no-cache"}
+    if if_none_match == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    try:
+        path = await documents.get_document(data, key)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return FileResponse(path, media_type="application/pdf", filename=f"devis-{quote_id[:8]}.pdf",
+                        content_disposition_type="inline", headers=headers)
+
+@app.post("/api/admin/documents/prerender")
+async def prerender_documents(
+    date: str = Query(..., pattern=r"^\d{4}-\d{2}-\d{2}$", description="Job date (YYYY-MM-DD)"),
+    quote_status: str = Query("confirmed", alias="status"),
+    tenant: TenantPartition = Depends(get_tenant),
+    x_api_key: Optional[str] = Header(None),
+):
+    """Render the documents of one day's jobs ahead of time (e.g. from a nightly cron)"""
+    require_admin(x_api_key, tenant)
+    if not DOCUMENTS_ENABLED:
+        raise HTTPException(status_code=503, detail="Documents not available")
+    batch = [
+        quote_document_data(tenant, quote_id, quote)
+        for quote_id, quote in list(tenant.db.quotes.items())
+        if str(quote.get("date", "")).startswith(date) and quote.get("status") == quote_status
+    ]
+    try:
+        result = await documents.prerender(batch)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"success": True, "date": date, "status": quote_status, **result}
+
 handler = app
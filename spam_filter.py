@@ -0,0 +1,221 @@
+"""
+Spam Filter
+Cheap pre-persistence checks for the public form endpoints
+"""
+
+import os
+import re
+import hmac
+import math
+import time
+import hashlib
+import secrets
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+# Filter configuration
+SPAM_SCORE_THRESHOLD = float(os.environ.get("SPAM_SCORE_THRESHOLD", "3.0"))
+SPAM_MIN_FILL_SECONDS = float(os.environ.get("SPAM_MIN_FILL_SECONDS", "3"))
+SPAM_FORM_TOKEN_TTL = float(os.environ.get("SPAM_FORM_TOKEN_TTL", "86400"))
+SPAM_FORM_SIGNING_KEY = os.environ.get("SPAM_FORM_SIGNING_KEY") or secrets.token_hex(32)
+
+# Disposable / throwaway mail providers seen in form spam
+DEFAULT_BLOCKED_DOMAINS = [
+    "mailinator.com", "guerrillamail.com", "guerrillamail.net", "10minutemail.com",
+    "yopmail.com", "yopmail.fr", "trashmail.com", "tempmail.com", "temp-mail.org",
+    "throwawaymail.com", "getnada.com", "sharklasers.com", "dispostable.com",
+    "maildrop.cc", "fakeinbox.com", "mailnesia.com", "spamgourmet.com",
+]
+
+# Hand-tuned token weights (positive = spam, negative = legitimate moving request)
+SPAM_TOKEN_WEIGHTS: Dict[str, float] = {
+    # SEO / marketing spam
+    "seo": 2.0, "backlinks": 2.5, "backlink": 2.5, "ranking": 1.2, "traffic": 1.0,
+    "guest": 0.8, "outreach": 1.5, "google": 0.8, "website": 0.6, "marketing": 1.0,
+    "leads": 0.8, "promotion": 1.2, "rank": 1.0, "clicks": 1.2, "followers": 1.5,
+    # Scams and adult / pharma spam
+    "crypto": 2.0, "bitcoin": 2.0, "investment": 1.5, "profit": 1.5, "forex": 2.5,
+    "casino": 2.5, "viagra": 3.0, "cialis": 3.0, "loan": 1.5, "lottery": 2.5,
+    "winner": 1.5, "dating": 2.0, "sexy": 2.5, "pills": 2.0, "unsubscribe": 1.5,
+    "offer": 0.7, "discount": 0.8, "cheap": 1.0, "free": 0.6, "guaranteed": 1.5,
+    "earn": 1.2, "money": 1.0, "usd": 1.0, "whatsapp": 1.0, "telegram": 1.2,
+    # Moving vocabulary (French / German / English)
+    "déménagement": -1.5, "demenagement": -1.5, "déménager": -1.5, "devis": -1.0,
+    "appartement": -1.0, "pièces": -1.0, "pieces": -0.8, "meubles": -1.2,
+    "carton": -1.0, "cartons": -1.0, "étage": -1.0, "ascenseur": -1.0,
+    "nettoyage": -1.0, "garde": -0.5, "genève": -0.8, "geneve": -0.8,
+    "lausanne": -0.8, "bureaux": -0.8, "employés": -0.8, "collaborateurs": -0.8,
+    "umzug": -1.5, "wohnung": -1.0, "moving": -0.8, "move": -0.5, "furniture": -1.0,
+}
+
+URL_PATTERN = re.compile(r"https?://|www\.", re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r"[a-zà-ÿ0-9]+")
+URL_WEIGHT = 1.5
+
+
+def _sign_form_time(issued_at: str) -> str:
+    return hmac.new(SPAM_FORM_SIGNING_KEY.encode(), issued_at.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def issue_form_token(now: Optional[float] = None) -> str:
+    """Signed token carrying the server time at which a form was rendered"""
+    issued_at = str(int(now or time.time()))
+    return f"{issued_at}.{_sign_form_time(issued_at)}"
+
+
+def form_token_age(token: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds since a form token was issued, measured on the server clock
+
+    Returns:
+        The age, or None if the token is missing, forged, expired or from the future
+    """
+    issued_at, _, signature = (token or "").partition(".")
+    if not issued_at.isdigit() or not hmac.compare_digest(
+        signature.encode(), _sign_form_time(issued_at).encode()
+    ):
+        return None
+    age = (now or time.time()) - int(issued_at)
+    if age < 0 or age > SPAM_FORM_TOKEN_TTL:
+        return None
+    return age
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings
+
+    Sized for `capacity` items at false-positive rate `error_rate`; the k bit
+    positions are derived from one blake2b digest by double hashing.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+@dataclass
+class SpamVerdict:
+    """Result of a spam check"""
+    score: float = 0.0
+    reasons: List[str] = field(default_factory=list)
+
+    @property
+    def is_spam(self) -> bool:
+        return self.score >= SPAM_SCORE_THRESHOLD
+
+
+def _read_list(path: Optional[str]) -> List[str]:
+    """Read a blocklist file: one entry per line, '#' comments allowed"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip().lower() for line in f if line.strip() and not line.startswith("#")]
+
+
+class SpamFilter:
+    """
+    Scores a form submission before it is stored or emailed
+
+    Checks, cheapest first: honeypot field, fill time, Bloom filters of
+    blocked emails and domains, then a linear token score over the free text.
+    """
+
+    def __init__(self, blocked_emails: Iterable[str] = (), blocked_domains: Iterable[str] = (),
+                 token_weights: Optional[Dict[str, float]] = None):
+        self.blocked_emails = BloomFilter()
+        self.blocked_emails.update(email.lower() for email in blocked_emails)
+        self.blocked_domains = BloomFilter()
+        self.blocked_domains.update(domain.lower() for domain in blocked_domains)
+        self.token_weights = token_weights if token_weights is not None else SPAM_TOKEN_WEIGHTS
+
+    @classmethod
+    def from_env(cls) -> "SpamFilter":
+        """
+        Build the filter from SPAM_BLOCKLIST_EMAILS / SPAM_BLOCKLIST_DOMAINS
+        (paths to text files), on top of the built-in disposable domains
+        """
+        return cls(
+            blocked_emails=_read_list(os.environ.get("SPAM_BLOCKLIST_EMAILS")),
+            blocked_domains=DEFAULT_BLOCKED_DOMAINS + _read_list(os.environ.get("SPAM_BLOCKLIST_DOMAINS")),
+        )
+
+    def score_text(self, text: str) -> float:
+        """Linear score of the distinct tokens in text, plus a penalty per link"""
+        lowered = text.lower()
+        weights = self.token_weights
+        score = sum(weights.get(token, 0.0) for token in set(TOKEN_PATTERN.findall(lowered)))
+        return score + URL_WEIGHT * len(URL_PATTERN.findall(lowered))
+
+    def check(self, email: str, text: str = "", honeypot: Optional[str] = None,
+              form_token: Optional[str] = None, now: Optional[float] = None) -> SpamVerdict:
+        """
+        Check one submission
+
+        Args:
+            email: Submitter email address
+            text: Free text of the form (message, subject, service needs...)
+            honeypot: Value of the hidden honeypot field (must be empty)
+            form_token: Token from issue_form_token, fetched when the form was rendered
+            now: Current Unix time, for tests
+
+        Returns:
+            SpamVerdict with the total score and the reasons that contributed
+        """
+        verdict = SpamVerdict()
+
+        if honeypot:
+            verdict.score += SPAM_SCORE_THRESHOLD
+            verdict.reasons.append("honeypot")
+
+        # A missing or unverifiable token is neutral: it proves nothing either way
+        age = form_token_age(form_token, now)
+        if age is not None and age < SPAM_MIN_FILL_SECONDS:
+            verdict.score += SPAM_SCORE_THRESHOLD
+            verdict.reasons.append("too_fast")
+
+        email = email.lower()
+        if email in self.blocked_emails:
+            verdict.score += SPAM_SCORE_THRESHOLD
+            verdict.reasons.append("blocked_email")
+        elif email.rpartition("@")[2] in self.blocked_domains:
+            verdict.score += SPAM_SCORE_THRESHOLD
+            verdict.reasons.append("blocked_domain")
+
+        if text:
+            text_score = self.score_text(text)
+            if text_score > 0:
+                verdict.score += text_score
+                verdict.reasons.append("content")
+
+        return verdict
+
+
+# Global filter instance, created on first use
+_spam_filter: Optional[SpamFilter] = None
+
+
+def get_spam_filter() -> SpamFilter:
+    """Get the spam filter instance"""
+    global _spam_filter
+    if _spam_filter is None:
+        _spam_filter = SpamFilter.from_env()
+    return _spam_filter
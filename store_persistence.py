@@ -0,0 +1,314 @@
+"""
+Store Persistence
+Snapshots, retention and compaction for the in-memory MockDB
+"""
+
+import gc
+import os
+import json
+import mmap
+import time
+import struct
+import marshal
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Persistence configuration
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "")  # empty disables snapshots
+SNAPSHOT_INTERVAL = float(os.environ.get("SNAPSHOT_INTERVAL", "300"))  # seconds
+SNAPSHOT_CHUNK_SIZE = 10_000  # records per marshal frame
+
+# Rebuild a collection dict once this fraction of its entries has been evicted
+COMPACTION_RATIO = 0.25
+
+MAGIC = b"BMSNAP01"
+TRAILER = struct.Struct("<Q8s")  # table of contents offset, magic
+
+Collections = Dict[str, Dict[str, dict]]
+
+
+def write_snapshot(path: str, collections: Collections) -> int:
+    """
+    Write collections to a binary snapshot file, atomically
+
+    Layout: MAGIC, then marshal frames each holding a dict of up to
+    SNAPSHOT_CHUNK_SIZE ``id: record`` entries, then a JSON table of contents
+    listing each frame's offset and length, then a fixed-size trailer
+    pointing at it.
+    Frames are independent so a reader can memory-map the file and decode
+    them without copying it into memory first.
+
+    Args:
+        path: Destination file; written to ``path + ".tmp"`` then renamed
+        collections: Mapping of collection name to {id: record}. Pass
+            shallow copies if the live dicts may change meanwhile.
+
+    Returns:
+        Number of records written
+    """
+    toc: Dict[str, Any] = {
+        "createdAt": datetime.utcnow().isoformat(),
+        "marshalVersion": marshal.version,
+        "collections": {},
+    }
+    total = 0
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        for name, records in collections.items():
+            frames: List[Tuple[int, int, int]] = []
+            items = list(records.items())
+            for start in range(0, len(items), SNAPSHOT_CHUNK_SIZE):
+                chunk = items[start:start + SNAPSHOT_CHUNK_SIZE]
+                blob = marshal.dumps(dict(chunk))
+                frames.append((f.tell(), len(blob), len(chunk)))
+                f.write(blob)
+            toc["collections"][name] = frames
+            total += len(items)
+
+        toc_offset = f.tell()
+        f.write(json.dumps(toc).encode("utf-8"))
+        f.write(TRAILER.pack(toc_offset, MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    return total
+
+
+def read_snapshot(path: str, pause_gc: bool = True) -> Collections:
+    """
+    Restore collections from a snapshot written by write_snapshot
+
+    With `pause_gc`, the cyclic garbage collector is disabled while decoding:
+    the restored records cannot form cycles, and letting it rescan millions
+    of freshly allocated dicts would more than double the restore time. The
+    pause is process-wide, so only use it while no requests are served.
+
+    Raises:
+        ValueError: If the file is not a valid snapshot or uses another marshal version
+    """
+    if not pause_gc:
+        return _read_frames(path)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _read_frames(path)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _read_frames(path: str) -> Collections:
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                if len(view) < len(MAGIC) + TRAILER.size or bytes(view[:len(MAGIC)]) != MAGIC:
+                    raise ValueError(f"Not a snapshot file: {path}")
+                toc_offset, magic = TRAILER.unpack(view[-TRAILER.size:])
+                if magic != MAGIC:
+                    raise ValueError(f"Truncated snapshot file: {path}")
+                toc = json.loads(bytes(view[toc_offset:-TRAILER.size]))
+                if toc.get("marshalVersion") != marshal.version:
+                    raise ValueError(f"Snapshot written with marshal version {toc.get('marshalVersion')}, "
+                                     f"this Python reads version {marshal.version}: {path}")
+
+                collections: Collections = {}
+                for name, frames in toc["collections"].items():
+                    records: Dict[str, dict] = {}
+                    for offset, length, _ in frames:
+                        records.update(marshal.loads(view[offset:offset + length]))
+                    collections[name] = records
+                return collections
+            finally:
+                view.release()
+
+
+def snapshot_path(tenant_id: str, default_tenant: Optional[str], base: str = SNAPSHOT_PATH) -> str:
+    """
+    Snapshot file of one tenant
+
+    A ``{tenant}`` placeholder in SNAPSHOT_PATH is replaced by the tenant id.
+    Otherwise the default tenant keeps SNAPSHOT_PATH itself (so single-tenant
+    snapshots stay readable) and other tenants get ``<name>.<tenant><ext>``.
+    """
+    if not base:
+        return ""
+    if "{tenant}" in base:
+        return base.replace("{tenant}", tenant_id)
+    if tenant_id == default_tenant:
+        return base
+    root, ext = os.path.splitext(base)
+    return f"{root}.{tenant_id}{ext}"
+
+
+def apply_retention(records: Dict[str, dict], max_age_days: Optional[float] = None,
+                    max_records: Optional[int] = None, now: Optional[datetime] = None) -> int:
+    """
+    Evict the oldest records of one collection
+
+    Records are stored in insertion (createdAt) order, so eviction only walks
+    the head of the dict and stops at the first record that is kept.
+
+    Args:
+        records: Collection dict, modified in place
+        max_age_days: Drop records whose createdAt is older than this
+        max_records: Keep at most this many (newest) records
+
+    Returns:
+        Number of records evicted
+    """
+    evicted = 0
+    if max_age_days:
+        cutoff = ((now or datetime.utcnow()) - timedelta(days=max_age_days)).isoformat()
+        expired = []
+        for record_id, record in records.items():
+            if record.get("createdAt", "") >= cutoff:
+                break
+            expired.append(record_id)
+        for record_id in expired:
+            del records[record_id]
+        evicted += len(expired)
+
+    if max_records is not None and len(records) > max_records:
+        overflow = len(records) - max_records
+        iterator = iter(records)
+        expired = [next(iterator) for _ in range(overflow)]
+        for record_id in expired:
+            del records[record_id]
+        evicted += overflow
+
+    return evicted
+
+
+def load_retention_policies(names: List[str]) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    Read RETENTION_<NAME>_DAYS and RETENTION_<NAME>_MAX for each collection
+
+    Example: RETENTION_MESSAGES_DAYS=180 drops contact messages older than ~6 months.
+    """
+    policies = {}
+    for name in names:
+        days = os.environ.get(f"RETENTION_{name.upper()}_DAYS")
+        limit = os.environ.get(f"RETENTION_{name.upper()}_MAX")
+        if days or limit:
+            policies[name] = {
+                "max_age_days": float(days) if days else None,
+                "max_records": int(limit) if limit else None,
+            }
+    return policies
+
+
+class StorePersistence:
+    """
+    Background snapshot, retention and compaction for a MockDB
+
+    The store must expose its collections as dict attributes named in
+    `db.COLLECTIONS`. Retention and compaction run on the event loop (they
+    only touch the head of each dict); the snapshot is encoded and written
+    in a worker thread from shallow copies.
+    """
+
+    def __init__(self, db, path: str = SNAPSHOT_PATH, interval: float = SNAPSHOT_INTERVAL,
+                 policies: Optional[Dict[str, Dict[str, Optional[float]]]] = None):
+        self.db = db
+        self.path = path
+        self.interval = interval
+        self.policies = policies if policies is not None else load_retention_policies(list(db.COLLECTIONS))
+        self._evicted_since_compaction: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {"snapshots": 0, "last_snapshot_ms": None, "evicted": 0, "compactions": 0}
+
+    def restore(self, pause_gc: bool = False) -> int:
+        """
+        Load the snapshot into the store, if one exists. Returns the number of records.
+
+        `pause_gc` is passed to read_snapshot: set it at startup only.
+
+        An unreadable snapshot is renamed to ``<path>.corrupt-<timestamp>`` so
+        the next snapshot cannot overwrite it. If it cannot be moved aside,
+        snapshots are disabled for this store.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        start = time.perf_counter()
+        try:
+            collections = read_snapshot(self.path, pause_gc=pause_gc)
+        except (ValueError, TypeError, KeyError, EOFError, OSError) as e:
+            print(f"Snapshot restore failed: {str(e)}")
+            self._set_aside()
+            return 0
+        total = 0
+        for name, records in collections.items():
+            if name in self.db.COLLECTIONS:
+                setattr(self.db, name, records)
+                total += len(records)
+        print(f"Restored {total} records from {self.path} in {time.perf_counter() - start:.2f}s")
+        return total
+
+    def _set_aside(self) -> None:
+        aside = f"{self.path}.corrupt-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}"
+        try:
+            os.replace(self.path, aside)
+            print(f"Unreadable snapshot kept as {aside}")
+        except OSError as e:
+            print(f"Cannot move unreadable snapshot aside ({str(e)}): snapshots disabled for {self.path}")
+            self.path = ""
+
+    def enforce_retention(self) -> int:
+        """Apply retention policies and compact collections that shrank a lot"""
+        total = 0
+        for name, policy in self.policies.items():
+            records = getattr(self.db, name)
+            evicted = apply_retention(records, **policy)
+            if not evicted:
+                continue
+            total += evicted
+            self._evicted_since_compaction[name] = self._evicted_since_compaction.get(name, 0) + evicted
+            # Python dicts never shrink on delete: rebuild to release the slots
+            if self._evicted_since_compaction[name] > COMPACTION_RATIO * (len(records) + evicted):
+                setattr(self.db, name, dict(records))
+                self._evicted_since_compaction[name] = 0
+                self.stats["compactions"] += 1
+        self.stats["evicted"] += total
+        return total
+
+    async def snapshot(self) -> int:
+        """Write a snapshot without blocking the event loop"""
+        if not self.path:
+            return 0
+        copies = {name: dict(getattr(self.db, name)) for name in self.db.COLLECTIONS}
+        start = time.perf_counter()
+        total = await asyncio.to_thread(write_snapshot, self.path, copies)
+        self.stats["snapshots"] += 1
+        self.stats["last_snapshot_ms"] = round(1000 * (time.perf_counter() - start), 1)
+        return total
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.enforce_retention()
+                await self.snapshot()
+            except Exception as e:
+                print(f"Store maintenance failed: {str(e)}")
+
+    def start(self) -> None:
+        """Start the periodic maintenance task (call from the event loop)"""
+        if self._task is None and (self.path or self.policies):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the maintenance task and write a final snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.path:
+            await self.snapshot()
@@ -0,0 +1,191 @@
+"""
+Tenant Service
+Resolves the moving company (tenant) behind each request and holds its settings
+"""
+
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Tenant configuration
+TENANTS_CONFIG = os.environ.get("TENANTS_CONFIG", "")  # path to a JSON file, empty = single tenant
+TENANTS_RELOAD_SECONDS = float(os.environ.get("TENANTS_RELOAD_SECONDS", "5"))
+DEFAULT_TENANT_ID = os.environ.get("DEFAULT_TENANT", "batimove")
+TENANT_HEADER = "X-Tenant-ID"
+
+DEFAULT_RATE_PER_MINUTE = 120
+DEFAULT_BURST = 30
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter
+
+    Refills `rate` tokens per second up to `burst`. Not thread-safe: it is
+    only used from the event loop thread.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self, cost: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+
+@dataclass
+class TenantConfig:
+    """Settings of one moving company"""
+    id: str
+    name: str = "Batimove Sarl"
+    hosts: List[str] = field(default_factory=list)
+    email: Dict[str, Any] = field(default_factory=dict)  # email_service.EmailSettings fields
+    rate_per_minute: float = DEFAULT_RATE_PER_MINUTE
+    burst: float = DEFAULT_BURST
+    admin_api_key: Optional[str] = None
+    public_base_url: Optional[str] = None  # links in emails; overrides PUBLIC_BASE_URL
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TenantConfig":
+        rate_limit = data.get("rate_limit", {})
+        return cls(
+            id=data["id"],
+            name=data.get("name", data["id"]),
+            hosts=[host.lower() for host in data.get("hosts", [])],
+            email=data.get("email", {}),
+            rate_per_minute=float(rate_limit.get("per_minute", DEFAULT_RATE_PER_MINUTE)),
+            burst=float(rate_limit.get("burst", DEFAULT_BURST)),
+            admin_api_key=data.get("admin_api_key"),
+            public_base_url=data.get("public_base_url"),
+        )
+
+
+class TenantRegistry:
+    """
+    Cached tenant configuration with hot reload
+
+    The config file is re-read when its modification time changes, checked
+    at most every `reload_interval` seconds, so resolving a tenant is two
+    dict lookups on the hot path. Rate-limit buckets survive reloads.
+
+    Requests matching no host go to the ``"default"`` tenant (DEFAULT_TENANT
+    if omitted; ``null`` answers them with 404). A config whose default is
+    not one of its tenants is rejected.
+
+    Config file format::
+
+        {
+          "default": "batimove",
+          "tenants": [
+            {"id": "batimove", "name": "Batimove Sarl", "hosts": ["batimove.ch"],
+             "email": {"company_email": "info@batimove.ch"},
+             "rate_limit": {"per_minute": 120, "burst": 30},
+             "admin_api_key": "..."}
+          ]
+        }
+    """
+
+    def __init__(self, path: str = TENANTS_CONFIG, reload_interval: float = TENANTS_RELOAD_SECONDS):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.default_id: Optional[str] = DEFAULT_TENANT_ID
+        self.tenants: Dict[str, TenantConfig] = {DEFAULT_TENANT_ID: TenantConfig(id=DEFAULT_TENANT_ID)}
+        self._hosts: Dict[str, str] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.reload(force=True)
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-read the config file if it changed. Returns True if tenants were reloaded."""
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            print(f"Tenant config not readable: {str(e)}")
+            return False
+        if not force and mtime == self._mtime:
+            return False
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            tenants = {entry["id"]: TenantConfig.from_dict(entry) for entry in data.get("tenants", [])}
+            default_id = data.get("default", DEFAULT_TENANT_ID)
+            if default_id is not None and default_id not in tenants:
+                raise ValueError(f"default tenant '{default_id}' is not defined")
+        except (ValueError, KeyError, OSError) as e:
+            # Keep serving the previous configuration
+            print(f"Invalid tenant config {self.path}: {str(e)}")
+            return False
+
+        with self._lock:
+            self.tenants = tenants
+            self.default_id = default_id
+            self._hosts = {host: tenant.id for tenant in tenants.values() for host in tenant.hosts}
+            for tenant_id, bucket in list(self._buckets.items()):
+                tenant = tenants.get(tenant_id)
+                if tenant is None:
+                    del self._buckets[tenant_id]
+                else:
+                    bucket.rate, bucket.burst = tenant.rate_per_minute / 60, tenant.burst
+            self._mtime = mtime
+        return True
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked >= self.reload_interval:
+            self._checked = now
+            self.reload()
+
+    def resolve(self, host: Optional[str] = None, tenant_id: Optional[str] = None) -> Optional[TenantConfig]:
+        """
+        Find the tenant of a request
+
+        Args:
+            host: Host header (the port is ignored)
+            tenant_id: Explicit tenant id from the X-Tenant-ID header; takes precedence
+
+        Returns:
+            The tenant, the default tenant if nothing matched, or None
+        """
+        self._maybe_reload()
+        if tenant_id:
+            return self.tenants.get(tenant_id)
+        if host:
+            matched = self._hosts.get(host.split(":", 1)[0].lower())
+            if matched:
+                return self.tenants.get(matched)
+        return self.tenants.get(self.default_id) if self.default_id else None
+
+    def allow(self, tenant: TenantConfig) -> bool:
+        """Consume one request from the tenant's rate limit"""
+        bucket = self._buckets.get(tenant.id)
+        if bucket is None:
+            bucket = self._buckets[tenant.id] = TokenBucket(tenant.rate_per_minute / 60, tenant.burst)
+        return bucket.allow()
+
+
+# Global registry instance
+_registry: Optional[TenantRegistry] = None
+
+
+def get_registry() -> TenantRegistry:
+    """Get the tenant registry instance"""
+    global _registry
+    if _registry is None:
+        _registry = TenantRegistry()
+    return _registry
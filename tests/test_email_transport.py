@@ -0,0 +1,142 @@
+"""
+SMTP transport tests against a local SMTP stand-in
+
+Usage: python -m pytest tests
+"""
+
+import os
+import sys
+import smtplib
+import threading
+import socketserver
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_transport import SmtpTransport
+
+PARAMS = {
+    "from": "Batimove <noreply@batimove.ch>",
+    "to": ["info@batimove.ch"],
+    "subject": "Test",
+    "html": "<p>Bonjour</p>",
+}
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that counts connections and transactions"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, data_reply: str = "250 OK", drop_after: int = 0):
+        self.data_reply = data_reply
+        self.drop_after = drop_after  # close the connection after this many messages (0 = never)
+        self.connections = 0
+        self.transactions = 0
+        self.resets = 0
+        super().__init__(("127.0.0.1", 0), SmtpSession)
+
+
+class SmtpSession(socketserver.StreamRequestHandler):
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        server = self.server
+        server.connections += 1
+        messages = 0
+        self.reply("220 stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stand-in")
+            elif command.startswith("MAIL"):
+                server.transactions += 1
+                self.reply("250 OK")
+            elif command.startswith("RCPT"):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.reply(server.data_reply)
+                messages += 1
+                if server.drop_after and messages >= server.drop_after:
+                    return
+            elif command == "RSET":
+                server.resets += 1
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+@pytest.fixture
+def smtp_server(request):
+    server = SmtpStandIn(**getattr(request, "param", {}))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_transport(server: SmtpStandIn) -> SmtpTransport:
+    host, port = server.server_address
+    return SmtpTransport(host=host, port=port, starttls=False, pool_size=2)
+
+
+def test_messages_reuse_one_connection(smtp_server):
+    transport = make_transport(smtp_server)
+    for _ in range(5):
+        transport.send(PARAMS)
+    transport.close()
+
+    assert smtp_server.connections == 1
+    assert smtp_server.transactions == 5
+    assert transport.stats.snapshot()["sent"] == 5
+
+
+@pytest.mark.parametrize("smtp_server", [{"data_reply": "554 Message rejected"}], indirect=True)
+def test_rejected_message_is_not_retried(smtp_server):
+    transport = make_transport(smtp_server)
+    with pytest.raises(smtplib.SMTPDataError):
+        transport.send(PARAMS)
+
+    assert smtp_server.connections == 1
+    assert smtp_server.transactions == 1
+    assert transport.stats.snapshot()["errors"] == 1
+
+    # The session was reset and pooled again
+    with pytest.raises(smtplib.SMTPDataError):
+        transport.send(PARAMS)
+    transport.close()
+    assert smtp_server.connections == 1
+    assert smtp_server.resets >= 1
+
+
+@pytest.mark.parametrize("smtp_server", [{"drop_after": 1}], indirect=True)
+def test_dropped_pooled_connection_is_retried_once(smtp_server):
+    transport = make_transport(smtp_server)
+    transport.send(PARAMS)
+    transport.send(PARAMS)
+    transport.close()
+
+    assert smtp_server.connections == 2
+    assert smtp_server.transactions == 2
+    assert transport.stats.snapshot()["sent"] == 2
+
+
+def test_message_id_uses_the_sender_domain():
+    message = SmtpTransport.build_message({**PARAMS, "from": "Déménagements Dupont <devis@dupont-demenagement.ch>"})
+    assert message["Message-ID"].endswith("@dupont-demenagement.ch>")
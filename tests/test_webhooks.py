@@ -0,0 +1,157 @@
+"""
+Webhook dispatcher tests against a local HTTP stand-in (httpx.MockTransport)
+
+Usage: python -m pytest tests
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import webhook_service
+from webhook_service import ALL_TENANTS, SIGNATURE_HEADER, WebhookDispatcher, verify_signature
+
+URL = "https://crm.example.com/hooks/batimove"
+SECRET = "s3cret"
+
+
+class HttpStandIn:
+    """Records every request and answers with the given status codes in turn (then 200)"""
+
+    def __init__(self, statuses=(), delay: float = 0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests = []
+        self.inflight = 0
+        self.max_inflight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            return httpx.Response(self.statuses.pop(0) if self.statuses else 200)
+        finally:
+            self.inflight -= 1
+
+    def events(self):
+        return [event for request in self.requests for event in json.loads(request.content)["events"]]
+
+
+@pytest.fixture(autouse=True)
+def fast_batches(monkeypatch):
+    monkeypatch.setattr(webhook_service, "WEBHOOK_BATCH_WINDOW", 0.05)
+
+
+def run(stand_in: HttpStandIn, scenario, **subscription):
+    """Run scenario(dispatcher, subscription) against a dispatcher wired to stand_in"""
+    async def main():
+        dispatcher = WebhookDispatcher(client=httpx.AsyncClient(transport=httpx.MockTransport(stand_in)))
+        target = dispatcher.subscribe(URL, SECRET, **subscription)
+        await scenario(dispatcher, target)
+        await dispatcher.stop()
+        return dispatcher.stats[target.id]
+    return asyncio.run(main())
+
+
+async def publish_and_drain(dispatcher, target, count=1, tenant=webhook_service.DEFAULT_TENANT_ID):
+    await dispatcher.start()
+    for i in range(count):
+        dispatcher.publish("quote.created", {"id": f"q{i}"}, tenant=tenant)
+    await dispatcher.drain()
+
+
+def test_events_are_batched_and_signed():
+    stand_in = HttpStandIn()
+    stats = run(stand_in, lambda d, t: publish_and_drain(d, t, count=3))
+
+    assert len(stand_in.requests) == 1
+    assert [event["data"]["id"] for event in stand_in.events()] == ["q0", "q1", "q2"]
+    request = stand_in.requests[0]
+    assert verify_signature(SECRET, request.content, request.headers[SIGNATURE_HEADER])
+    assert not verify_signature("other", request.content, request.headers[SIGNATURE_HEADER])
+    assert not verify_signature(SECRET, request.content, f"t={int(time.time())},v1=é")
+    assert (stats.delivered, stats.batches) == (3, 1)
+
+
+def test_5xx_and_429_are_retried(monkeypatch):
+    sleep = asyncio.sleep
+    monkeypatch.setattr(webhook_service.asyncio, "sleep", lambda delay: sleep(0))
+    stand_in = HttpStandIn(statuses=[503, 429])
+    stats = run(stand_in, publish_and_drain)
+
+    assert len(stand_in.requests) == 3
+    assert (stats.delivered, stats.retries, stats.failed) == (1, 2, 0)
+
+
+def test_4xx_is_not_retried():
+    stand_in = HttpStandIn(statuses=[400])
+    stats = run(stand_in, publish_and_drain)
+
+    assert len(stand_in.requests) == 1
+    assert (stats.delivered, stats.retries, stats.failed) == (0, 0, 1)
+
+
+def test_concurrent_batches_are_bounded_per_target(monkeypatch):
+    monkeypatch.setattr(webhook_service, "WEBHOOK_BATCH_SIZE", 1)
+    stand_in = HttpStandIn(delay=0.05)
+    stats = run(stand_in, lambda d, t: publish_and_drain(d, t, count=6), concurrency=2)
+
+    assert stand_in.max_inflight == 2
+    assert (stats.delivered, stats.batches) == (6, 6)
+
+
+def test_full_queue_drops_events(monkeypatch):
+    monkeypatch.setattr(webhook_service, "WEBHOOK_QUEUE_SIZE", 2)
+
+    async def scenario(dispatcher, target):
+        # Not started yet: nothing drains the queue
+        for i in range(5):
+            dispatcher.publish("lead.created", {"id": f"l{i}"})
+        await publish_and_drain(dispatcher, target, count=0)
+
+    stand_in = HttpStandIn()
+    stats = run(stand_in, scenario)
+
+    assert [event["data"]["id"] for event in stand_in.events()] == ["l0", "l1"]
+    assert (stats.delivered, stats.dropped) == (2, 3)
+
+
+def test_subscriptions_only_get_their_tenant():
+    stand_in = HttpStandIn()
+
+    async def scenario(dispatcher, target):
+        everyone = dispatcher.subscribe(URL + "/all", SECRET, tenant=ALL_TENANTS)
+        assert dispatcher.publish("quote.created", {"id": "a"}, tenant="other")["tenantId"] == "other"
+        await publish_and_drain(dispatcher, target)
+        assert dispatcher.stats[everyone.id].delivered == 2
+
+    stats = run(stand_in, scenario)
+    assert stats.delivered == 1
+    assert sorted(request.url.path for request in stand_in.requests) == [
+        "/hooks/batimove", "/hooks/batimove/all", "/hooks/batimove/all",
+    ]
+
+
+def test_full_queue_of_one_tenant_does_not_drop_another(monkeypatch):
+    monkeypatch.setattr(webhook_service, "WEBHOOK_QUEUE_SIZE", 2)
+    stand_in = HttpStandIn()
+
+    async def scenario(dispatcher, target):
+        for i in range(5):
+            dispatcher.publish("quote.created", {"id": f"a{i}"}, tenant="a")
+        dispatcher.publish("quote.created", {"id": "b0"}, tenant="b")
+        await publish_and_drain(dispatcher, target, count=0)
+
+    stats = run(stand_in, scenario, tenant=ALL_TENANTS)
+    assert "b0" in [event["data"]["id"] for event in stand_in.events()]
+    assert (stats.delivered, stats.dropped) == (3, 3)
@@ -0,0 +1,354 @@
+"""
+Webhook Service
+Fans out new quotes, messages and leads to CRM and partner systems
+"""
+
+import os
+import json
+import hmac
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+
+from tenant_service import DEFAULT_TENANT_ID
+
+# Webhook configuration
+WEBHOOK_BATCH_SIZE = int(os.environ.get("WEBHOOK_BATCH_SIZE", "20"))
+WEBHOOK_BATCH_WINDOW = float(os.environ.get("WEBHOOK_BATCH_WINDOW", "0.5"))  # seconds
+WEBHOOK_MAX_RETRIES = int(os.environ.get("WEBHOOK_MAX_RETRIES", "5"))
+WEBHOOK_CONCURRENCY = int(os.environ.get("WEBHOOK_CONCURRENCY", "4"))  # in-flight batches per target
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "10000"))
+WEBHOOK_TIMEOUT = float(os.environ.get("WEBHOOK_TIMEOUT", "10"))
+
+SIGNATURE_HEADER = "X-Batimove-Signature"
+ALL_TENANTS = "*"
+
+
+def sign_payload(secret: str, body: bytes, timestamp: int) -> str:
+    """
+    Compute the HMAC-SHA256 signature header value for a webhook body
+
+    The timestamp is part of the signed message so receivers can reject
+    replayed deliveries.
+
+    Args:
+        secret: Shared secret of the subscription
+        body: Raw JSON body sent to the target
+        timestamp: Unix timestamp of the delivery attempt
+
+    Returns:
+        Header value in the form ``t=<timestamp>,v1=<hex digest>``
+    """
+    message = f"{timestamp}.".encode() + body
+    digest = hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret: str, body: bytes, header: str, tolerance: int = 300) -> bool:
+    """
+    Verify a signature header produced by sign_payload (receiver side)
+
+    Args:
+        secret: Shared secret of the subscription
+        body: Raw request body as received
+        header: Value of the X-Batimove-Signature header
+        tolerance: Maximum accepted age of the signature in seconds
+
+    Returns:
+        True if the signature is valid and fresh
+    """
+    try:
+        parts = dict(item.split("=", 1) for item in header.split(","))
+        timestamp = int(parts["t"])
+    except (ValueError, KeyError):
+        return False
+
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+
+    expected = sign_payload(secret, body, timestamp)
+    return hmac.compare_digest(expected.encode(), header.encode())
+
+
+@dataclass
+class Subscription:
+    """A webhook target and the events it listens to"""
+    url: str
+    secret: str
+    events: List[str] = field(default_factory=lambda: ["*"])
+    concurrency: int = WEBHOOK_CONCURRENCY
+    tenant: str = DEFAULT_TENANT_ID  # ALL_TENANTS = events of every tenant
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+    def matches(self, event_type: str, tenant: Optional[str] = None) -> bool:
+        """Check whether this subscription wants the given event type and tenant"""
+        if self.tenant != ALL_TENANTS and self.tenant != tenant:
+            return False
+        return "*" in self.events or event_type in self.events
+
+
+@dataclass
+class DeliveryStats:
+    """Per-subscription delivery counters"""
+    delivered: int = 0
+    failed: int = 0
+    dropped: int = 0
+    retries: int = 0
+    batches: int = 0
+
+
+class WebhookDispatcher:
+    """
+    Asynchronous webhook fan-out
+
+    ``publish`` only enqueues the event and returns immediately, so it never
+    blocks the request path. Each subscription has one queue and worker per
+    tenant, so a burst from one tenant cannot fill the queue (and drop the
+    events) of another. Workers group events into single-tenant
+    micro-batches and deliver them through a shared, pooled
+    ``httpx.AsyncClient`` (keep-alive connections are reused across
+    deliveries). A semaphore bounds the number of in-flight batches per target.
+    """
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.stats: Dict[str, DeliveryStats] = {}
+        self._client = client
+        self._owns_client = client is None
+        self._queues: Dict[str, Dict[str, asyncio.Queue]] = {}  # subscription id -> tenant -> queue
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._workers: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._inflight: set = set()
+        self._running = False
+
+    # Subscriptions
+
+    def subscribe(self, url: str, secret: str, events: Optional[List[str]] = None,
+                  concurrency: int = WEBHOOK_CONCURRENCY, tenant: str = DEFAULT_TENANT_ID) -> Subscription:
+        """Register a webhook target for one tenant (or ALL_TENANTS) and return the subscription"""
+        subscription = Subscription(url=url, secret=secret, events=events or ["*"],
+                                    concurrency=max(1, concurrency), tenant=tenant)
+        self.subscriptions[subscription.id] = subscription
+        self.stats[subscription.id] = DeliveryStats()
+        self._queues[subscription.id] = {}
+        self._semaphores[subscription.id] = asyncio.Semaphore(subscription.concurrency)
+        return subscription
+
+    def unsubscribe(self, subscription_id: str) -> bool:
+        """Remove a webhook target. Pending events for it are discarded."""
+        subscription = self.subscriptions.pop(subscription_id, None)
+        if subscription is None:
+            return False
+        for key in [key for key in self._workers if key[0] == subscription_id]:
+            self._workers.pop(key).cancel()
+        self._queues.pop(subscription_id, None)
+        self._semaphores.pop(subscription_id, None)
+        return True
+
+    def load_from_env(self, default_tenant: Optional[str] = DEFAULT_TENANT_ID) -> None:
+        """
+        Load subscriptions from the WEBHOOK_SUBSCRIPTIONS environment variable
+
+        Expected format is a JSON list, e.g.
+        ``[{"url": "https://crm.example.com/hooks", "secret": "...", "events": ["quote.created"]}]``
+        A target only receives the events of its ``"tenant"``; without that
+        key, of `default_tenant`. ``"tenant": "*"`` subscribes to every tenant.
+        """
+        raw = os.environ.get("WEBHOOK_SUBSCRIPTIONS", "").strip()
+        if not raw:
+            return
+        try:
+            entries = json.loads(raw)
+        except json.JSONDecodeError as e:
+            print(f"Invalid JSON in WEBHOOK_SUBSCRIPTIONS: {str(e)}")
+            return
+        for entry in entries:
+            self.subscribe(
+                url=entry["url"],
+                secret=entry.get("secret", ""),
+                events=entry.get("events"),
+                concurrency=int(entry.get("concurrency", WEBHOOK_CONCURRENCY)),
+                tenant=entry.get("tenant", default_tenant),
+            )
+
+    # Lifecycle
+
+    async def start(self) -> None:
+        """Open the pooled HTTP client and start one worker per subscription"""
+        if self._running:
+            return
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=WEBHOOK_TIMEOUT,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20,
+                                    keepalive_expiry=30.0),
+                headers={"User-Agent": "Batimove-Webhooks/1.0"},
+            )
+        self._running = True
+        for subscription_id, queues in self._queues.items():
+            for tenant in queues:
+                self._start_worker(self.subscriptions[subscription_id], tenant)
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Flush pending events (best effort) and close the HTTP client"""
+        if not self._running:
+            return
+        try:
+            await asyncio.wait_for(self.drain(), timeout)
+        except asyncio.TimeoutError:
+            print("Webhook shutdown: pending events were not delivered in time")
+        self._running = False
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), *self._inflight, return_exceptions=True)
+        self._workers.clear()
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def drain(self) -> None:
+        """Wait until every queued event has been delivered or given up on"""
+        for queues in list(self._queues.values()):
+            for queue in list(queues.values()):
+                await queue.join()
+
+    def _start_worker(self, subscription: Subscription, tenant: str) -> None:
+        key = (subscription.id, tenant)
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._worker(subscription, tenant))
+
+    def _queue(self, subscription: Subscription, tenant: str) -> asyncio.Queue:
+        """Queue of one subscription for one tenant, created on first event"""
+        queues = self._queues[subscription.id]
+        queue = queues.get(tenant)
+        if queue is None:
+            queue = queues[tenant] = asyncio.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+            if self._running:
+                self._start_worker(subscription, tenant)
+        return queue
+
+    # Publishing
+
+    def publish(self, event_type: str, data: Dict[str, Any],
+                tenant: str = DEFAULT_TENANT_ID) -> Optional[Dict[str, Any]]:
+        """
+        Enqueue an event for every matching subscription
+
+        Never awaits network I/O: if a target's queue for this tenant is full
+        the event is dropped for that target and counted in its stats.
+
+        Args:
+            event_type: Event name, e.g. "quote.created"
+            data: JSON-serialisable event payload
+            tenant: Id of the tenant the event belongs to
+
+        Returns:
+            The event envelope, or None if no subscription matched
+        """
+        targets = [s for s in self.subscriptions.values() if s.matches(event_type, tenant)]
+        if not targets:
+            return None
+
+        event = {
+            "id": str(uuid.uuid4()),
+            "type": event_type,
+            "tenantId": tenant,
+            "createdAt": datetime.utcnow().isoformat(),
+            "data": data,
+        }
+        for subscription in targets:
+            try:
+                self._queue(subscription, tenant).put_nowait(event)
+            except asyncio.QueueFull:
+                self.stats[subscription.id].dropped += 1
+        return event
+
+    # Delivery
+
+    async def _worker(self, subscription: Subscription, tenant: str) -> None:
+        queue = self._queues[subscription.id][tenant]
+        semaphore = self._semaphores[subscription.id]  # shared by the target's tenants
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + WEBHOOK_BATCH_WINDOW
+            while len(batch) < WEBHOOK_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await semaphore.acquire()
+            task = asyncio.create_task(self._deliver(subscription, batch))
+            self._inflight.add(task)
+            task.add_done_callback(lambda t, n=len(batch): self._batch_done(t, queue, semaphore, n))
+
+    def _batch_done(self, task: asyncio.Task, queue: asyncio.Queue,
+                    semaphore: asyncio.Semaphore, count: int) -> None:
+        self._inflight.discard(task)
+        semaphore.release()
+        for _ in range(count):
+            queue.task_done()
+
+    async def _deliver(self, subscription: Subscription, batch: List[Dict[str, Any]]) -> bool:
+        """Send one batch, retrying network errors, 429 and 5xx with exponential backoff"""
+        stats = self.stats.setdefault(subscription.id, DeliveryStats())
+        body = json.dumps({"events": batch}, default=str).encode()
+
+        for attempt in range(WEBHOOK_MAX_RETRIES + 1):
+            headers = {
+                "Content-Type": "application/json",
+                SIGNATURE_HEADER: sign_payload(subscription.secret, body, int(time.time())),
+                "X-Batimove-Delivery": str(uuid.uuid4()),
+            }
+            try:
+                response = await self._client.post(subscription.url, content=body, headers=headers)
+                if response.status_code < 300:
+                    stats.delivered += len(batch)
+                    stats.batches += 1
+                    return True
+                if response.status_code != 429 and response.status_code < 500:
+                    print(f"Webhook rejected by {subscription.url}: HTTP {response.status_code}")
+                    break
+            except httpx.HTTPError as e:
+                print(f"Webhook delivery to {subscription.url} failed: {str(e)}")
+
+            if attempt < WEBHOOK_MAX_RETRIES:
+                stats.retries += 1
+                await asyncio.sleep(min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random()))
+
+        stats.failed += len(batch)
+        return False
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Delivery counters and queue depth per subscription (secrets omitted)"""
+        return {
+            sub_id: {
+                "url": sub.url,
+                "events": sub.events,
+                "tenant": sub.tenant,
+                "queued": sum(queue.qsize() for queue in self._queues[sub_id].values()),
+                **vars(self.stats[sub_id]),
+            }
+            for sub_id, sub in self.subscriptions.items()
+        }
+
+
+# Global dispatcher instance
+_dispatcher = WebhookDispatcher()
+
+
+def get_dispatcher() -> WebhookDispatcher:
+    """Get the webhook dispatcher instance"""
+    return _dispatcher